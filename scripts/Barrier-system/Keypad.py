@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 ########################################################################
 # Filename    : Keypad.py
-# Description : The module of matrix keypad 
+# Description : The module of matrix keypad
 # Author      : freenove
-# modification: 2023/05/15
+# modification: 2026/10/18 - event driven scanning, pins allocated once
 ########################################################################
-from gpiozero import InputDevice, OutputDevice
+from gpiozero import Button
+import queue
+import threading
 import time
 #class Key:Define some of the properties of Key
 class Key(object):
@@ -18,166 +20,149 @@ class Key(object):
     #define OPEN and CLOSED
     OPEN = 0
     CLOSED =1
-    #constructor
-    def __init__(self):
-        self.kchar = self.NO_KEY
-        self.kstate = self.IDLE
-        self.kcode = -1
-        self.stateChanged = False
 
 class Keypad(object):
     NULL = '\0'
-    LIST_MAX = 10   #Max number of keys on the active list.
-    MAPSIZE = 10    #MAPSIZE is the number of rows (times 16 columns)
-    bitMap = [0]*MAPSIZE
-    key = [Key()]*LIST_MAX
-    holdTime = 500      #key hold time
-    holdTimer = 0
-    startTime = 0
     #Allows custom keymap, pin configuration, and keypad sizes.
-    def __init__(self,usrKeyMap,row_Pins,col_Pins,num_Rows,num_Cols):
+    def __init__(self,usrKeyMap,row_Pins,col_Pins,num_Rows,num_Cols,callback=None):
         self.rowPins = row_Pins
         self.colPins = col_Pins
         self.numRows = num_Rows
         self.numCols = num_Cols
-        
         self.keymap = usrKeyMap
+        self.callback = callback        #Called as callback(keyChar, state) from the scan thread
+        self.events = queue.Queue(64)   #(keyChar, state) for every state change
+        self.holdTime = 500             #key hold time in ms
         self.setDebounceTime(10)
-    #Returns a single key only. Retained for backwards compatibility.   
-    def getKey(self):
-        single_key = True
-        if(self.getKeys() and self.key[0].stateChanged and (self.key[0].kstate == self.key[0].PRESSED)):
-            return self.key[0].kchar
-        single_key = False
-        return self.key[0].NO_KEY
-    #Populate the key list. 
-    def getKeys(self):
-        keyActivity = False
-        #Limit how often the keypad is scanned.
-        if((time.time() - self.startTime) > self.debounceTime*0.001):
-            self.scanKeys()
-            keyActivity = self.updateList()
-            self.startTime = time.time()
-        return keyActivity
-    #Hardware scan ,the result store in bitMap  
+        #Compact per-key state, indexed by key code (row * numCols + col)
+        self.kstate = bytearray(num_Rows * num_Cols)
+        self.holdTimer = [0.0] * (num_Rows * num_Cols)
+        #Pins are allocated once. Rows are inputs with pull-ups; a pressed key pulls its row low
+        #while the key's column is driven low.
+        self.rows = [Button(pin, pull_up=True) for pin in row_Pins]
+        #Columns switch between driven low and high impedance, so they use raw pins from the
+        #same pin factory as the rows.
+        self.cols = [self.rows[0].pin_factory.pin(pin) for pin in col_Pins]
+        self.wake = threading.Event()
+        for row in self.rows:
+            row.when_pressed = self._on_row_edge
+        self.running = True
+        self._idle()
+        self.thread = threading.Thread(target=self._run, name="keypad", daemon=True)
+        self.thread.start()
+    #Idle: all columns low, any key press gives a falling edge on its row.
+    def _idle(self):
+        for pin in self.cols:
+            pin.function = 'output'
+            pin.state = 0
+    #Set a column to high impedance so several pressed keys never short two outputs.
+    def _release_col(self, pin):
+        pin.function = 'input'
+        pin.pull = 'up'
+    def _on_row_edge(self):
+        self.wake.set()
+    def _run(self):
+        while self.running:
+            self.wake.wait()
+            #Scan until every key has been released and reported again.
+            while self.running:
+                self.wake.clear()
+                keys_down = self.scanKeys()
+                self.updateStates(keys_down)
+                if not keys_down and not any(self.kstate):
+                    break
+                time.sleep(self.debounceTime * 0.001)
+            self._idle()
+            #A key pressed while the columns were switching may not have produced an edge
+            if any(row.is_pressed for row in self.rows):
+                self.wake.set()
+    #Hardware scan, returns the set of key codes that are currently pressed.
     def scanKeys(self):
-        #Re-intialize the row pins. Allows sharing these pins with other hardware.
-        inputs = list(map(lambda pin: InputDevice(pin, pull_up=True), self.rowPins))
-        #bitMap stores ALL the keys that are being pressed.   outputs = OutputDevice(pin_c,active_high=False)
-        for pin_c in self.colPins:
-            outputs = OutputDevice(pin_c)
-            outputs.off()
-            i=0
-            for r in self.rowPins: #keypress is active low so invert to high.   inputs[i].is_active inputs[i].value
-                self.bitMap[self.rowPins.index(r)] = self.bitWrite(self.bitMap[self.rowPins.index(r)],self.colPins.index(pin_c), inputs[i].value)
-                i =i+1
-            #Set pin to high impedance input. Effectively ends column pulse.
-            outputs.on()
-            outputs.close()
-            outputs = InputDevice(pin_c,pull_up=True)
-    #Manage the list without rearranging the keys. Returns true if any keys on the list changed state.      
-    def updateList(self):
-        anyActivity = False
-        kk = Key()
-        #Delete any IDLE keys
-        for i in range(self.LIST_MAX):
-            if(self.key[i].kstate == kk.IDLE):
-                self.key[i].kchar = kk.NO_KEY
-                self.key[i].kcode = -1
-                self.key[i].stateChanged = False
-        # Add new keys to empty slots in the key list.
-        for r in range(self.numRows):
-            for c in range(self.numCols):
-                button = self.bitRead(self.bitMap[r],c)
-                keyChar = self.keymap[r * self.numCols +c]
-                keyCode = r * self.numCols +c
-                idx = self.findInList(keyCode)
-                #Key is already on the list so set its next state.
-                if(idx > -1):
-                    self.nextKeyState(idx,button)
-                #Key is NOT on the list so add it.
-                if((idx == -1) and button):
-                    for i in range(self.LIST_MAX):
-                        if(self.key[i].kchar == kk.NO_KEY): #Find an empty slot or don't add key to list.
-                            self.key[i].kchar = keyChar
-                            self.key[i].kcode = keyCode
-                            self.key[i].kstate = kk.IDLE    #Keys NOT on the list have an initial state of IDLE.
-                            self.nextKeyState(i,button)
-                            break   #Don't fill all the empty slots with the same key.
-        #Report if the user changed the state of any key.
-        for i in range(self.LIST_MAX):
-            if(self.key[i].stateChanged):
-                anyActivity = True
-        return anyActivity      
-    #This function is a state machine but is also used for debouncing the keys. 
-    def nextKeyState(self,idx, button):
-        self.key[idx].stateChanged = False
-        kk = Key()
-        if(self.key[idx].kstate == kk.IDLE):
-            if(button == kk.CLOSED):
-                self.transitionTo(idx,kk.PRESSED)
-                self.holdTimer = time.time()    #Get ready for next HOLD state.
-        elif(self.key[idx].kstate == kk.PRESSED):
-            if((time.time() - self.holdTimer) > self.holdTime*0.001):   #Waiting for a key HOLD...  
-                self.transitionTo(idx,kk.HOLD)
-            elif(button == kk.OPEN):        # or for a key to be RELEASED.
-                self.transitionTo(idx,kk.RELEASED)
-        elif(self.key[idx].kstate == kk.HOLD):
-            if(button == kk.OPEN):
-                self.transitionTo(idx,kk.RELEASED)
-        elif(self.key[idx].kstate == kk.RELEASED):
-            self.transitionTo(idx,kk.IDLE)
-            
-    def transitionTo(self,idx,nextState):
-        self.key[idx].kstate = nextState
-        self.key[idx].stateChanged = True
-    #Search by code for a key in the list of active keys.
-    #Returns -1 if not found or the index into the list of active keys.
-    def findInList(self,keyCode):
-        for i in range(self.LIST_MAX):
-            if(self.key[i].kcode == keyCode):
-                return i
-        return -1
-    #set Debounce Time, The default is 50ms                 
+        pressed = set()
+        for pin in self.cols:
+            self._release_col(pin)
+        for c, pin in enumerate(self.cols):
+            pin.function = 'output'
+            pin.state = 0
+            for r, row in enumerate(self.rows):
+                if row.is_pressed:
+                    pressed.add(r * self.numCols + c)
+            self._release_col(pin)
+        return pressed
+    #This function is a state machine but is also used for debouncing the keys.
+    def updateStates(self, keys_down):
+        now = time.time()
+        for code in range(len(self.kstate)):
+            button = Key.CLOSED if code in keys_down else Key.OPEN
+            state = self.kstate[code]
+            if state == Key.IDLE:
+                if button == Key.CLOSED:
+                    self.holdTimer[code] = now    #Get ready for next HOLD state.
+                    self.transitionTo(code, Key.PRESSED)
+            elif state == Key.PRESSED:
+                if (now - self.holdTimer[code]) > self.holdTime*0.001:   #Waiting for a key HOLD...
+                    self.transitionTo(code, Key.HOLD)
+                elif button == Key.OPEN:        # or for a key to be RELEASED.
+                    self.transitionTo(code, Key.RELEASED)
+            elif state == Key.HOLD:
+                if button == Key.OPEN:
+                    self.transitionTo(code, Key.RELEASED)
+            elif state == Key.RELEASED:
+                self.transitionTo(code, Key.IDLE)
+
+    def transitionTo(self, code, nextState):
+        self.kstate[code] = nextState
+        keyChar = self.keymap[code]
+        try:
+            self.events.put_nowait((keyChar, nextState))
+        except queue.Full:
+            pass    #Nobody reads the queue (callback only), drop the event
+        if self.callback is not None:
+            self.callback(keyChar, nextState)
+    #Returns the next pressed key or NULL without blocking. Retained for backwards compatibility.
+    def getKey(self):
+        while True:
+            try:
+                keyChar, state = self.events.get_nowait()
+            except queue.Empty:
+                return self.NULL
+            if state == Key.PRESSED:
+                return keyChar
+    #Blocks until a key is pressed. Returns NULL if the timeout expires first.
+    def waitForKey(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            remaining = None if deadline is None else max(0, deadline - time.time())
+            try:
+                keyChar, state = self.events.get(timeout=remaining)
+            except queue.Empty:
+                return self.NULL
+            if state == Key.PRESSED:
+                return keyChar
+    #set Debounce Time, The default is 10ms
     def setDebounceTime(self,ms):
         self.debounceTime = ms
     #set HoldTime,The default is 500ms
     def setHoldTime(self,ms):
         self.holdTime = ms
-    #   
-    def isPressed(keyChar):
-        for i in range(self.LIST_MAX):
-            if(self.key[i].kchar == keyChar):
-                if(self.key[i].kstate == self.self.key[i].PRESSED and self.key[i].stateChanged):
-                    return True
-        return False
-    #           
-    def waitForKey():
-        kk = Key()
-        waitKey = kk.NO_KEY
-        while(waitKey == kk.NO_KEY):
-            waitKey = getKey()
-        return waitKey
-    
-    def getState():
-        return self.key[0].kstate
-    #   
-    def keyStateChanged():
-        return self.key[0].stateChanged
-    
-    def bitWrite(self,x,n,b):
-        if(b):
-            x |= (1<<n)
-        else:
-            x &=(~(1<<n))
-        return x
-    def bitRead(self,x,n):
-        if((x>>n)&1 == 1):
-            return True
-        else:
-            return False
+    #
+    def isPressed(self,keyChar):
+        code = self.keymap.index(keyChar)
+        return self.kstate[code] in (Key.PRESSED, Key.HOLD)
+    #
+    def getState(self,keyChar):
+        return self.kstate[self.keymap.index(keyChar)]
 
-#######################EXAMPLE##################################        
+    def close(self):
+        self.running = False
+        self.wake.set()
+        self.thread.join(timeout=1)
+        for row in self.rows:
+            row.close()
+        for pin in self.cols:
+            pin.close()
+
+#######################EXAMPLE##################################
 ROWS = 4
 COLS = 4
 keys =  [   '1','2','3','A',
@@ -185,19 +170,19 @@ keys =  [   '1','2','3','A',
             '7','8','9','C',
             '*','0','#','D'     ]
 rowsPins = [18, 23, 24, 25]
-colsPins = [10, 22, 27, 17]    
+colsPins = [10, 22, 27, 17]
 
 def loop():
     keypad = Keypad(keys,rowsPins,colsPins,ROWS,COLS)
     keypad.setDebounceTime(50)
     while(True):
-        key = keypad.getKey()
+        key = keypad.waitForKey()
         if(key != keypad.NULL):
             print ("You Pressed Key : %c "%(key) )
-        
+
 if __name__ == '__main__':     # Program start from here
     print ("Program is starting ... ")
     try:
         loop()
     except KeyboardInterrupt:  # When 'Ctrl+C' is pressed, the child program destroy() will be  executed.
-        print("Ending program")
\ No newline at end of file
+        print("Ending program")
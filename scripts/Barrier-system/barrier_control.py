@@ -1,27 +1,57 @@
 from gpiozero import AngularServo, Device, Button, LED
 from gpiozero.pins.pigpio import PiGPIOFactory
+from collections import deque
+import threading
 import time
-import paho.mqtt.client as mqtt
+from messaging import bus
+from motion_profile import MotionPlayer, OPEN_VALUE, CLOSED_VALUE, OPEN_TIME, CLOSE_TIME, REOPEN_TIME
 
 
 
 
-# Setup MQTT client
-MQTT_BROKER = "localhost"  
 MQTT_TOPIC = "barrier"
-client = mqtt.Client()
-client.connect(MQTT_BROKER)
 
 
 
 
-# fsr active flag
-monitor_fsr = True
+# FSR safety: time from pressure to servo reversal must stay below this
+SAFETY_TARGET_MS = 50
 
 # force sensitve resistor
 fsr = Button(13, pull_up=False)
 led = LED(6)
 
+# Set from the FSR edge callbacks, so the closing loop reacts without polling
+obstruction = threading.Event()
+path_clear = threading.Event()
+# Aborts the closing move: set by an FSR press or by a cancelled close (interrupt_close)
+stop_closing = threading.Event()
+fsr_pressed_at = 0.0
+reaction_times = deque(maxlen=100)  # FSR press -> reverse latency in ms
+
+
+def _on_fsr_pressed():
+    global fsr_pressed_at
+    fsr_pressed_at = time.perf_counter()
+    path_clear.clear()
+    obstruction.set()
+    stop_closing.set()
+    led.on()
+
+
+def _on_fsr_released():
+    obstruction.clear()
+    path_clear.set()
+    led.off()
+
+
+fsr.when_pressed = _on_fsr_pressed
+fsr.when_released = _on_fsr_released
+if fsr.is_pressed:
+    _on_fsr_pressed()
+else:
+    _on_fsr_released()
+
 # Use pigpio for smoother servo control
 Device.pin_factory = PiGPIOFactory()
 
@@ -30,54 +60,91 @@ myGPIO = 26
 servo = AngularServo(myGPIO, min_angle=0, max_angle=90,
                      min_pulse_width=0.0005, max_pulse_width=0.0025)
 servo.angle = 0  # Initial position = barrier down
+player = MotionPlayer(servo)
+
+
+def _record_reaction():
+    latency = (time.perf_counter() - fsr_pressed_at) * 1000
+    reaction_times.append(latency)
+    print(f"FSR reaction time: {latency:.1f} ms")
+    if latency > SAFETY_TARGET_MS:
+        print(f"WARNING: FSR reaction time above safety target of {SAFETY_TARGET_MS} ms")
+
+
+def reaction_stats():
+    """Min/avg/max FSR press -> reverse latency in ms over the recent closing attempts."""
+    if not reaction_times:
+        return None
+    return {
+        "count": len(reaction_times),
+        "min_ms": round(min(reaction_times), 1),
+        "avg_ms": round(sum(reaction_times) / len(reaction_times), 1),
+        "max_ms": round(max(reaction_times), 1),
+    }
+
 
+def _wait_for_release(cancel=None):
+    """Waits for the FSR to be released. Returns False if `cancel` is set first."""
+    waited = 0.0
+    while not path_clear.wait(timeout=0.1):
+        if cancel is not None and cancel.is_set():
+            return False
+        waited += 0.1
+        if waited >= 5:
+            print("FSR is active, waiting for release...")
+            waited = 0.0
+    return True
 
-def close_barrier():
-    if fsr.is_pressed:
-       client.publish(MQTT_TOPIC, 'FSR Sensor triggered, move your car!')
-    
-    # wait until no pressure is detected under the barrier
-    while fsr.is_pressed:
-        print("FSR is active, waiting for release...")
-        time.sleep(0.1)
 
-    print("Closing barrier...")
-    value = 1000
-    while value >= 0:
+def interrupt_close():
+    """Stops a running closing move at once (the caller sets its `cancel` event first)."""
+    stop_closing.set()
+
+
+def close_barrier(cancel=None):
+    """Closes the barrier, reopening and retrying while the FSR detects an obstruction.
+
+    Returns True when closed, or False if `cancel` was set (e.g. by a new open request);
+    the barrier then stays where it stopped.
+    """
+    while True:
+        if cancel is not None and cancel.is_set():
+            return False
+
         if fsr.is_pressed:
-            print("Pressure detected during closing, reopening barrier")
-            # open barrier fully
-            for reopen in range(value, 1001, 10):
-                servo.value = round(reopen / 1000, 2) - 1
-                time.sleep(0.01)
-
-            # Wait until fsr is released
-            while fsr.is_pressed:
-                print("Still pressure, still waiting")
-                time.sleep(0.5)
-          
-            print("Path clear restarting closing...")
-            return close_barrier()  # start closing procedure again
-        servo.value = round(value / 1000, 2) - 1
-        time.sleep(0.01)
-        value -= 5
+           bus.publish(MQTT_TOPIC, 'FSR Sensor triggered, move your car!')
+
+        # wait until no pressure is detected under the barrier
+        if not _wait_for_release(cancel):
+            return False
+
+        print("Closing barrier...")
+        # The move stops as soon as the FSR callback or interrupt_close() sets stop_closing
+        stop_closing.clear()
+        if obstruction.is_set() or (cancel is not None and cancel.is_set()):
+            stop_closing.set()
+        if player.move_to(CLOSED_VALUE, CLOSE_TIME, abort=stop_closing):
+            break
+
+        if cancel is not None and cancel.is_set() and not obstruction.is_set():
+            print(f"Open requested during closing at {player.angle:.0f} degrees")
+            return False
+
+        print(f"Pressure detected during closing at {player.angle:.0f} degrees, reopening barrier")
+        # open barrier fully from where it stopped
+        player.move_to(OPEN_VALUE, REOPEN_TIME, on_start=_record_reaction)
+
+        # Wait until fsr is released
+        if not _wait_for_release(cancel):
+            return False
+        print("Path clear restarting closing...")
 
     print("Barrier fully closed.")
-    
+    return True
+
 
 
 def open_barrier():
+    """Opens the barrier from wherever it is, e.g. from a closing move that was interrupted."""
     print("Barrier opening...")
-    for value in range(0, 1001, 5):
-        servo.value = round(value / 1000, 2) - 1  # move from -1 to 0
-        time.sleep(0.01)
-        
-        
-def monitor_fsr_led():
-    global monitor_fsr
-    while monitor_fsr:
-        if fsr.is_pressed:
-            led.on()
-        else:
-            led.off()
-        time.sleep(0.05)         
+    return player.move_to(OPEN_VALUE, OPEN_TIME)
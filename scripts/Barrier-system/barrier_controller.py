@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+
+from barrier_control import open_barrier, close_barrier, interrupt_close
+
+
+# Barrier states
+CLOSED = "closed"
+OPENING = "opening"
+OPEN = "open"
+CLOSING = "closing"
+
+HOLD_TIME = 5  # seconds the barrier stays open for a vehicle to pass
+
+
+class BarrierController:
+    """Runs the open -> hold -> close cycle on its own thread.
+
+    Commands from MQTT, the PIN pad or the web interface are queued with request().
+    Repeated "open" requests during a cycle extend the hold time instead of starting
+    a new cycle; an "open" during closing stops the barrier and reverses it from where
+    it is. Every state transition is passed to on_state(state, source).
+    """
+
+    def __init__(self, hold_time=HOLD_TIME, on_state=None):
+        self.hold_time = hold_time
+        self.on_state = on_state
+        self.commands = queue.Queue()
+        self.state = CLOSED
+        self.hold_until = 0
+        self.reopen = threading.Event()   # Set by open requests; cancels a running close
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="barrier", daemon=True)
+        self.thread.start()
+        return self
+
+    def request(self, action, source="unknown"):
+        """Queues "open" or "close". Returns immediately."""
+        self.commands.put((action, source))
+        if action == "open":
+            self.reopen.set()
+            interrupt_close()
+
+    def _set_state(self, state, source):
+        self.state = state
+        print(f"Barrier state: {state} ({source})")
+        if self.on_state:
+            try:
+                self.on_state(state, source)
+            except Exception as e:
+                print("Error publishing barrier state:", e)
+
+    def _drain(self):
+        """Collapses all queued commands into the last one (or None)."""
+        last = None
+        while True:
+            try:
+                last = self.commands.get_nowait()
+            except queue.Empty:
+                return last
+
+    def _open(self, source):
+        if self.state != OPEN:
+            self._set_state(OPENING, source)
+            open_barrier()
+            self._set_state(OPEN, source)
+        self.hold_until = time.monotonic() + self.hold_time
+
+    def _close(self, source):
+        """Returns False if an open request interrupted the close."""
+        # Cleared before CLOSING, so an open request from now on is seen by close_barrier
+        self.reopen.clear()
+        self._set_state(CLOSING, source)
+        if not close_barrier(cancel=self.reopen):
+            return False
+        self._set_state(CLOSED, source)
+        return True
+
+    def _run(self):
+        while True:
+            if self.state == CLOSED:
+                action, source = self.commands.get()
+                if action == "open":
+                    self._open(source)
+                continue
+
+            # OPEN: wait for the hold time to expire or for a new command
+            pending = self._drain()
+            if pending is None:
+                remaining = self.hold_until - time.monotonic()
+                if remaining > 0:
+                    try:
+                        pending = self.commands.get(timeout=remaining)
+                    except queue.Empty:
+                        pending = None
+            if pending is not None:
+                action, source = pending
+                if action == "open":
+                    print("Barrier already open, extending hold time.")
+                    self._open(source)
+                    continue
+            elif time.monotonic() < self.hold_until:
+                continue
+            else:
+                source = "timeout"
+
+            closed = self._close(source)
+            # Requests that arrived while closing: reopen once, however many there were
+            pending = self._drain()
+            if pending is not None and pending[0] == "open":
+                self._open(pending[1])
+            elif not closed:
+                self._open(source)
+
+
+controller = BarrierController()
@@ -1,19 +1,18 @@
 from pinpad import loop_keypad
 from mqtt_handler import start_mqtt
-from barrier_control import monitor_fsr_led
-import threading
+from barrier_controller import controller
 
 
 if __name__ == "__main__":
     print("System started.")
 
-    # Start MQTT in background
-    mqtt_thread = threading.Thread(target=start_mqtt, daemon=True)
-    mqtt_thread.start()
+    # Start barrier state machine (open -> hold -> close) in background
+    controller.start()
 
-     # Start FSR LED monitor in background
-    led_thread = threading.Thread(target=monitor_fsr_led, daemon=True)
-    led_thread.start()
+    # Connect the shared MQTT session and route barrier commands to the controller
+    start_mqtt()
+
+    # FSR LED and safety stop are driven by the FSR edge callbacks in barrier_control
 
     # Start keypad input loop
     loop_keypad()
@@ -0,0 +1,86 @@
+import threading
+from collections import Counter
+import paho.mqtt.client as mqtt
+
+
+# MQTT setup
+MQTT_BROKER = "localhost"
+MQTT_PORT = 1883
+
+
+class MessageBus:
+    """One MQTT connection per process plus in-process publish/subscribe.
+
+    publish() hands a message straight to local subscribers (no broker round trip) and
+    mirrors it to the broker for the dashboard and other nodes. Messages from the broker
+    are delivered to the same local subscribers. The broker's copy of a mirrored message
+    is dropped so local subscribers see every message once.
+    """
+
+    def __init__(self, host=MQTT_BROKER, port=MQTT_PORT):
+        self.host = host
+        self.port = port
+        self.client = mqtt.Client()
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+        self.subscriptions = []  # (topic filter, handler)
+        self.echoes = Counter()  # (topic, payload) mirrored by us and not yet seen back
+        self.lock = threading.Lock()
+
+    def start(self):
+        print("Connecting to MQTT broker...")
+        self.client.connect_async(self.host, self.port)
+        self.client.loop_start()
+
+    def subscribe(self, topic, handler):
+        """handler(topic, payload) is called for local and broker messages on `topic`."""
+        with self.lock:
+            self.subscriptions.append((topic, handler))
+        if self.client.is_connected():
+            self.client.subscribe(topic)
+
+    def publish(self, topic, payload, retain=False, mirror=True):
+        self._deliver(topic, payload)
+        if mirror:
+            # Under the lock, so the broker's echo cannot be handled before it is registered
+            with self.lock:
+                info = self.client.publish(topic, payload, retain=retain)
+                if info.rc == mqtt.MQTT_ERR_SUCCESS and self._has_subscriber(topic):
+                    self.echoes[(topic, payload)] += 1
+
+    def _has_subscriber(self, topic):
+        return any(mqtt.topic_matches_sub(sub, topic) for sub, _ in self.subscriptions)
+
+    def _deliver(self, topic, payload):
+        with self.lock:
+            handlers = [h for sub, h in self.subscriptions if mqtt.topic_matches_sub(sub, topic)]
+        for handler in handlers:
+            try:
+                handler(topic, payload)
+            except Exception as e:
+                print("Error processing message:", e)
+
+    def _on_connect(self, client, userdata, flags, rc, *args):
+        if rc != 0:
+            print("MQTT connection failed, return code:", rc)
+            return
+        print("Connected to MQTT broker.")
+        with self.lock:
+            topics = set(sub for sub, _ in self.subscriptions)
+            self.echoes.clear()
+        for topic in topics:
+            client.subscribe(topic)
+
+    def _on_message(self, client, userdata, message):
+        payload = message.payload.decode()
+        key = (message.topic, payload)
+        with self.lock:
+            if self.echoes[key] > 0:
+                self.echoes[key] -= 1
+                if not self.echoes[key]:
+                    del self.echoes[key]
+                return
+        self._deliver(message.topic, payload)
+
+
+bus = MessageBus()
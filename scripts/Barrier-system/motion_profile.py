@@ -0,0 +1,106 @@
+import threading
+import time
+
+
+# Servo positions in gpiozero value units (-1 .. 1)
+CLOSED_VALUE = -1.0
+OPEN_VALUE = 0.0
+
+STEP = 0.02            # seconds between servo updates (one 50 Hz servo frame)
+OPEN_TIME = 2.0        # seconds for a full open movement
+CLOSE_TIME = 2.0       # seconds for a full close movement
+REOPEN_TIME = 1.0      # seconds for a full reopen after an obstruction (scaled by distance)
+ACCEL_FRACTION = 0.25  # share of a trapezoidal move spent accelerating (and decelerating)
+
+
+def s_curve(x):
+    """Smootherstep: zero velocity and acceleration at both ends."""
+    return x * x * x * (x * (6 * x - 15) + 10)
+
+
+def trapezoid(x, accel=ACCEL_FRACTION):
+    """Constant acceleration, cruise, constant deceleration."""
+    vmax = 1.0 / (1.0 - accel)
+    if x < accel:
+        return 0.5 * vmax / accel * x * x
+    if x > 1.0 - accel:
+        return 1.0 - 0.5 * vmax / accel * (1.0 - x) ** 2
+    return 0.5 * vmax * accel + vmax * (x - accel)
+
+
+SHAPES = {"s-curve": s_curve, "trapezoid": trapezoid}
+
+
+def build_profile(start, end, duration, shape="s-curve", step=STEP):
+    """Precomputes servo values from start to end, one per step."""
+    steps = max(1, int(round(duration / step)))
+    curve = SHAPES[shape]
+    return [start + (end - start) * curve(i / steps) for i in range(1, steps + 1)]
+
+
+def partial_profile(start, end, full_time, shape="s-curve"):
+    """Profile for a move that covers only part of the full range, e.g. reopen from half way."""
+    share = abs(end - start) / abs(OPEN_VALUE - CLOSED_VALUE)
+    return build_profile(start, end, full_time * share, shape)
+
+
+# Precomputed once for the full movements
+OPEN_PROFILE = build_profile(CLOSED_VALUE, OPEN_VALUE, OPEN_TIME)
+CLOSE_PROFILE = build_profile(OPEN_VALUE, CLOSED_VALUE, CLOSE_TIME)
+PRECOMPUTED = {
+    (CLOSED_VALUE, OPEN_VALUE, OPEN_TIME): OPEN_PROFILE,
+    (OPEN_VALUE, CLOSED_VALUE, CLOSE_TIME): CLOSE_PROFILE,
+}
+
+
+class MotionPlayer:
+    """Plays precomputed profiles on a servo against absolute deadlines.
+
+    Every step is scheduled relative to the start of the move, so scheduler jitter in one
+    step does not add up over the move. The pulses themselves are generated by pigpio.
+    """
+
+    def __init__(self, servo, step=STEP):
+        self.servo = servo
+        self.step = step
+        self.position = servo.value if servo.value is not None else CLOSED_VALUE
+        self.lock = threading.Lock()
+
+    @property
+    def angle(self):
+        return self.servo.angle
+
+    def play(self, profile, abort=None, on_start=None):
+        """Moves through `profile`. Returns True when finished, False if `abort` was set.
+
+        `abort` is a threading.Event; it is waited on between steps, so the move stops
+        within one servo write after it is set. `on_start` is called after the first write.
+        """
+        with self.lock:
+            start = time.monotonic()
+            for i, value in enumerate(profile):
+                if abort is not None and abort.is_set():
+                    return False
+                self.servo.value = value
+                self.position = value
+                if i == 0 and on_start is not None:
+                    on_start()
+                delay = start + (i + 1) * self.step - time.monotonic()
+                if delay > 0:
+                    if abort is not None:
+                        if abort.wait(delay):
+                            return False
+                    else:
+                        time.sleep(delay)
+            return True
+
+    def move_to(self, end, full_time, abort=None, shape="s-curve", on_start=None):
+        """Moves from the current position to `end`, taking the share of full_time it needs."""
+        if abs(end - self.position) < 1e-6:
+            return True
+        profile = None
+        if shape == "s-curve":
+            profile = PRECOMPUTED.get((self.position, end, full_time))
+        if profile is None:
+            profile = partial_profile(self.position, end, full_time, shape)
+        return self.play(profile, abort, on_start)
@@ -1,41 +1,36 @@
-import paho.mqtt.client as mqtt
 import json
-from barrier_control import open_barrier, close_barrier
-import paho.mqtt.client as mqtt
-import time
+from barrier_controller import controller, CLOSED
+from messaging import bus
 
 
 # MQTT setup
-MQTT_BROKER = "localhost"
 MQTT_TOPIC = "barrier"
+MQTT_STATE_TOPIC = "barrier/state"  # State transitions of the barrier controller
 
 
 
 
-def on_message(client, userdata, message):
-    print(f"Message received: {message.payload.decode()}")
+def on_message(topic, payload):
+    print(f"Message received: {payload}")
     try:
-        data = json.loads(message.payload.decode())
-
-        if data.get("action") == "open":
-            print("Barrier opening...")
-            open_barrier()
-            time.sleep(5)  # Wait for vehicle to pass
-            close_barrier()
-            client.publish(MQTT_TOPIC, '{"action": "closed"}')
-        elif data.get("action")=="close":
-            print("Manual closing via MQTT...")
-            close_barrier()
-        
+        data = json.loads(payload)
+
+        # Only queue the command: the paho network loop must never wait for the servo
+        if data.get("action") in ("open", "close"):
+            controller.request(data["action"], source=data.get("source", "mqtt"))
 
     except Exception as e:
         print("Error processing message:", e)
 
 
+def publish_state(state, source):
+    bus.publish(MQTT_STATE_TOPIC, json.dumps({"state": state, "source": source}), retain=True)
+    if state == CLOSED:
+        bus.publish(MQTT_TOPIC, '{"action": "closed"}')
+
+
 def start_mqtt():
     print("Starting MQTT listener...")
-    client = mqtt.Client()
-    client.connect(MQTT_BROKER)
-    client.subscribe(MQTT_TOPIC)
-    client.on_message = on_message
-    client.loop_forever()
\ No newline at end of file
+    controller.on_state = publish_state
+    bus.subscribe(MQTT_TOPIC, on_message)
+    bus.start()  # One connection for the whole process, network loop in the background
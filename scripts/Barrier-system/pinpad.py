@@ -1,8 +1,6 @@
 
 import Keypad
-from barrier_control import open_barrier, close_barrier
-import time
-import paho.mqtt.client as mqtt
+from messaging import bus
 
 
 # Keypad-configuration
@@ -17,11 +15,8 @@ colsPins = [10, 22, 27, 17]
 
 CORRECT_PIN = "1234"
 
-# Setup MQTT client
-MQTT_BROKER = "localhost"  
+# Commands go over the process-local bus (and are mirrored to the broker)
 MQTT_TOPIC = "barrier"
-client = mqtt.Client()
-client.connect(MQTT_BROKER)
 
 keypad = Keypad.Keypad(keys, rowsPins, colsPins, ROWS, COLS)
 keypad.setDebounceTime(50)
@@ -32,14 +27,14 @@ def loop_keypad():
     global pin_input
     print("PIN pad active - enter 4-digit code")
     while True:
-        key = keypad.getKey()
+        key = keypad.waitForKey()  # Blocks until the scan thread reports a key press
         if key != keypad.NULL:
             print(f"Pressed: {key}")
             if key == '#':
                 print("Entered PIN:", pin_input)
                 if pin_input == CORRECT_PIN:
                     print("PIN correct. Opening barrier.")
-                    client.publish(MQTT_TOPIC, '{"action": "open"}')
+                    bus.publish(MQTT_TOPIC, '{"action": "open", "source": "pin"}')
                 else:
                     print("Incorrect PIN.")
                 pin_input = ""
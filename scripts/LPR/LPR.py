@@ -1,89 +1,275 @@
 import cv2
 import imutils
 import numpy as np
-import pytesseract
-import paho.mqtt.client as mqtt
+import threading
+import time
+import ocr
+import consensus as cons
+import allowlist
+import mqtt_publisher
 import json
 
-client = mqtt.Client()
+client = mqtt_publisher.Publisher()  # One persistent broker session, started by main.py
+ocr_engine = ocr.get_backend()  # Loaded once, reused for every plate
 
 
-def rec(img):
+# Plate tracking configuration
+TRACK_PADDING = 0.5   # Search window grows by this fraction of the plate size on every side
+TRACK_MIN_PADDING = 24  # pixels
 
-    print("Starting detection...")
 
+class PlateTracker(object):
+    """Remembers where the last plate was so the next frame only searches a padded window."""
+
+    def __init__(self, padding=TRACK_PADDING, min_padding=TRACK_MIN_PADDING):
+        self.padding = padding
+        self.min_padding = min_padding
+        self.box = None  # (x, y, w, h) of the last plate in frame coordinates
+        self.hits = 0
+        self.misses = 0
+        self.streak = 0  # Consecutive frames the plate was found inside the window
+        self.lock = threading.Lock()
+
+    def window(self, shape):
+        """Returns (x0, y0, x1, y1) of the search window, or None if not tracking."""
+        with self.lock:
+            if self.box is None:
+                return None
+            x, y, w, h = self.box
+        px = max(int(w * self.padding), self.min_padding)
+        py = max(int(h * self.padding), self.min_padding)
+        return (max(x - px, 0), max(y - py, 0),
+                min(x + w + px, shape[1]), min(y + h + py, shape[0]))
+
+    def update(self, box, tracked):
+        with self.lock:
+            self.box = box
+            if tracked:
+                self.hits += 1
+                self.streak += 1
+            else:
+                self.streak = 0
+
+    def lost(self):
+        with self.lock:
+            self.box = None
+            self.misses += 1
+            self.streak = 0
+
+
+# Preprocessing configuration
+PREPROCESS_MODE = "full"  # "full": bilateral filter + Canny at full resolution
+                          # "pyramid": search on a downscaled pyramid level, crop at full resolution
+PYRAMID_LEVELS = 1        # Each level halves width and height
+
+
+tracker = PlateTracker()
+consensus = cons.PlateConsensus()
+authorised = allowlist.Allowlist().start_watcher()  # Reloads when the list changes
+
+
+def lap(timings, stage, start):
+    """Adds the time since `start` to timings[stage] (if timings are collected) and returns now."""
+    if timings is None:
+        return start
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + now - start
+    return now
+
+
+def _find_quad(edged, offset):
+    # findContours modifies its input in older OpenCV versions; edged is not reused
+    cnts = cv2.findContours(edged, cv2.RETR_TREE,
+                            cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+    cnts = imutils.grab_contours(cnts)
+    cnts = sorted(cnts, key=cv2.contourArea, reverse=True)[:10]
+
+    for c in cnts:
 
+        peri = cv2.arcLength(c, True)
+        approx = cv2.approxPolyDP(c, 0.018 * peri, True)
+
+        if len(approx) == 4:
+            return approx
+
+    return None
+
+
+def _search_full(img, offset, timings=None):
+    t = time.perf_counter() if timings is not None else 0
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    gray = cv2.bilateralFilter(gray, 11, 17, 17) 
+    t = lap(timings, "grayscale", t)
+    gray = cv2.bilateralFilter(gray, 11, 17, 17)
+    t = lap(timings, "filter", t)
     edged = cv2.Canny(gray, 30, 200)
+    t = lap(timings, "canny", t)
+
+    screenCnt = _find_quad(edged, offset)
+
+    lap(timings, "contours", t)
+    return gray, screenCnt
+
+
+class PyramidBuffers(object):
+    """Preallocated images for the pyramid search, sized for the largest input seen so far.
+
+    Smaller inputs (tracking windows) use views into the same buffers.
+    """
+
+    def __init__(self, levels=PYRAMID_LEVELS):
+        self.levels = levels
+        self.shape = (0, 0)
+        self.gray = None
+        self.pyramid = []
+        self.blurred = None
+        self.edged = None
+
+    def _allocate(self, h, w):
+        self.shape = (h, w)
+        self.gray = np.empty((h, w), np.uint8)
+        self.pyramid = []
+        for _ in range(self.levels):
+            h, w = (h + 1) // 2, (w + 1) // 2
+            self.pyramid.append(np.empty((h, w), np.uint8))
+        self.blurred = np.empty((h, w), np.uint8)
+        self.edged = np.empty((h, w), np.uint8)
+
+    def views(self, h, w):
+        """Returns (gray, [pyramid levels], blurred, edged) views for an h x w input."""
+        if h > self.shape[0] or w > self.shape[1]:
+            self._allocate(max(h, self.shape[0]), max(w, self.shape[1]))
+        gray = self.gray[:h, :w]
+        pyramid = []
+        for level in self.pyramid:
+            h, w = (h + 1) // 2, (w + 1) // 2
+            pyramid.append(level[:h, :w])
+        return gray, pyramid, self.blurred[:h, :w], self.edged[:h, :w]
+
+
+_buffers = threading.local()  # One set of buffers per locating thread
+
+
+def _search_pyramid(img, offset, timings=None):
+    t = time.perf_counter() if timings is not None else 0
+    buffers = getattr(_buffers, "pyramid", None)
+    if buffers is None or buffers.levels != PYRAMID_LEVELS:
+        buffers = _buffers.pyramid = PyramidBuffers(PYRAMID_LEVELS)
+    gray, pyramid, blurred, edged = buffers.views(img.shape[0], img.shape[1])
+
+    cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=gray)
+    t = lap(timings, "grayscale", t)
+    small = gray
+    for level in pyramid:
+        cv2.pyrDown(small, dst=level, dstsize=(level.shape[1], level.shape[0]))
+        small = level
+    t = lap(timings, "pyramid", t)
+    # pyrDown already low-passes, a small Gaussian replaces the full-size bilateral filter
+    cv2.GaussianBlur(small, (3, 3), 0, dst=blurred)
+    t = lap(timings, "filter", t)
+    cv2.Canny(blurred, 30, 200, edges=edged)
+    t = lap(timings, "canny", t)
+
+    screenCnt = _find_quad(edged, (0, 0))
+    if screenCnt is not None:
+        # Back to full-resolution frame coordinates for drawing and the OCR crop
+        screenCnt = screenCnt * (2 ** len(pyramid)) + np.array(offset, np.int32)
+
+    lap(timings, "contours", t)
+    return gray, screenCnt
+
+
+SEARCH_MODES = {
+    "full": _search_full,
+    "pyramid": _search_pyramid,
+}
+
+
+def locate(img, tracker=tracker, timings=None, mode=None):
+    """Preprocesses the frame and searches for a plate-shaped quadrilateral.
+
+    While a plate is tracked only a padded window around its last position is searched;
+    the full frame is searched when there is no track or the plate left the window.
+    Returns (gray, screenCnt, offset): gray covers the searched area starting at offset,
+    screenCnt is in frame coordinates and None if no plate was found. If a `timings` dict
+    is given, the seconds spent per preprocessing stage are added to it. `mode` selects
+    the preprocessing path (default PREPROCESS_MODE).
+    """
+    _search = SEARCH_MODES[mode or PREPROCESS_MODE]
+    window = tracker.window(img.shape) if tracker is not None else None
+    if window is not None:
+        x0, y0, x1, y1 = window
+        gray, screenCnt = _search(img[y0:y1, x0:x1], (x0, y0), timings)
+        if screenCnt is not None:
+            tracker.update(cv2.boundingRect(screenCnt), True)
+            return gray, screenCnt, (x0, y0)
+        tracker.lost()
+
+    gray, screenCnt = _search(img, (0, 0), timings)
+    if tracker is not None and screenCnt is not None:
+        tracker.update(cv2.boundingRect(screenCnt), False)
+    return gray, screenCnt, (0, 0)
+
+
+def crop(gray, screenCnt, offset=(0, 0)):
+    """Cuts the plate's bounding rectangle out of the grayscale search area."""
+    x, y, w, h = cv2.boundingRect(screenCnt)
+    x -= offset[0]
+    y -= offset[1]
+    return gray[y:y + h, x:x + w]
+
+
+def publish(text, confidence=None):
+    """Publishes the confirmed plate and opens the barrier for authorised plates."""
+    msg = {
+        "plate-present":text,
+        "confidence":confidence
+    }
+
+    client.publish("plate", json.dumps(msg))
+
+    if authorised.lookup(text) is not None:
+
+      print("OPEN GATE")
+      msg = {
+        "action":"open"
+      }
+
+      client.publish("barrier", json.dumps(msg))
+
+
+def needs_ocr():
+    """False while the vehicle in front of the camera has already been confirmed."""
+    return not consensus.vehicle_done
+
+
+def read_plate(Cropped):
+    """OCRs a plate crop and publishes once the consensus over several frames confirms it."""
+    result = ocr_engine.read_one(Cropped)
+    print("RAW TEXT: " + result.text)
+    confirmed = consensus.add(result.text, result.confidence)
+    if confirmed is not None:
+        print("CONFIRMED: %s (%.2f)" % (confirmed.plate, confirmed.confidence))
+        publish(confirmed.plate, confirmed.confidence)
+    return confirmed
+
+
+def rec(img):
+
+    print("Starting detection...")
 
     try:
-        
-        cnts = cv2.findContours(edged.copy(), cv2.RETR_TREE,
-                                cv2.CHAIN_APPROX_SIMPLE)
-        cnts = imutils.grab_contours(cnts)
-        cnts = sorted(cnts, key=cv2.contourArea, reverse=True)[:10]
-        screenCnt = None
-
-        
-        for c in cnts:
-            
-            peri = cv2.arcLength(c, True)
-            approx = cv2.approxPolyDP(c, 0.018 * peri, True)
-
-            
-            if len(approx) == 4:
-                screenCnt = approx
-                break
-              
+        gray, screenCnt, offset = locate(img)
+
         if screenCnt is None:
             print("NOT DETECTED")
-            detected = 0
+            consensus.missed()
         else:
             print("DETECTED")
-            detected = 1
-
-
-        if detected == 1:
+            consensus.detected()
             cv2.drawContours(img, [screenCnt], -1, (0, 255, 0), 3)
 
-            mask = np.zeros(gray.shape, np.uint8)
-            new_image = cv2.drawContours(mask, [screenCnt], 0, 255, -1,)
-            new_image = cv2.bitwise_and(img, img, mask=mask)
-    
-            
-            (x, y) = np.where(mask == 255)
-            (topx, topy) = (np.min(x), np.min(y))
-            (bottomx, bottomy) = (np.max(x), np.max(y))
-            Cropped = gray[topx:bottomx + 1, topy:bottomy + 1]
-    
-            
-            text = pytesseract.image_to_string(
-                Cropped, config="-c tessedit_char_whitelist='ABCDEFGHIJKLMNOPRSTUVYZ0123456789'")
-            text = text.rstrip("\n")
-            
-            
-            print("RAW TEXT: " + text)
-            
-            client.connect("10.0.0.1", 1883, 60)
-            msg = {
-                "plate-present":text
-            }
-              
-            client.publish("plate", json.dumps(msg))
-            
-            if text == "TKBL08" :
-            
-              print("OPEN GATE")
-              client.connect("10.0.0.1", 1883, 60)
-              msg = {
-                "action":"open"
-              }
-              
-              client.publish("barrier", json.dumps(msg))
-              
-            client.disconnect()
-              
+            if needs_ocr():
+                read_plate(crop(gray, screenCnt, offset))
 
     except Exception:
         pass
@@ -0,0 +1,165 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Allowlist configuration
+ALLOWLIST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "authorised_plates.txt")
+SQLITE_QUERY = "SELECT plate FROM plates"
+MAX_EDITS = 1           # Edit distance tolerated after confusion normalisation
+RELOAD_INTERVAL = 5.0   # seconds between checks whether the source changed
+
+# Characters OCR commonly confuses, mapped to one representative
+CONFUSIONS = str.maketrans({
+    "O": "0", "Q": "0", "D": "0",
+    "I": "1", "L": "1",
+    "B": "8",
+    "S": "5",
+    "Z": "2",
+    "G": "6",
+})
+
+
+def normalise(plate):
+    """Upper case without spaces or dashes."""
+    return "".join(ch for ch in plate.upper() if ch.isalnum())
+
+
+def confusion_key(plate):
+    return normalise(plate).translate(CONFUSIONS)
+
+
+def edit_distance(a, b, limit=None):
+    """Levenshtein distance; stops early once every entry of a row exceeds `limit`."""
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def deletions(word, max_dist):
+    """All strings obtained by deleting up to max_dist characters from word (including word)."""
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_dist):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+class _Index(object):
+    """Immutable lookup structures for one version of the allowlist."""
+
+    def __init__(self, plates, max_edits=MAX_EDITS):
+        self.max_edits = max_edits
+        self.exact = set()
+        self.by_key = {}
+        self.by_deletion = {}  # deletion variant -> confusion keys (symmetric delete index)
+        for plate in plates:
+            plate = normalise(plate)
+            if not plate:
+                continue
+            key = confusion_key(plate)
+            self.exact.add(plate)
+            self.by_key.setdefault(key, plate)
+            for variant in deletions(key, max_edits):
+                self.by_deletion.setdefault(variant, set()).add(key)
+
+    def lookup(self, plate):
+        plate = normalise(plate)
+        if plate in self.exact:
+            return plate
+        key = confusion_key(plate)
+        match = self.by_key.get(key)
+        if match is not None or self.max_edits <= 0:
+            return match
+        # Candidates share a deletion variant with the key; the cost depends on the
+        # plate length only, not on the number of authorised plates
+        best = None
+        for variant in deletions(key, self.max_edits):
+            for candidate in self.by_deletion.get(variant, ()):
+                d = edit_distance(key, candidate, self.max_edits)
+                if d <= self.max_edits and (best is None or (d, candidate) < best):
+                    best = (d, candidate)
+        return self.by_key[best[1]] if best else None
+
+
+def read_plates(path, query=SQLITE_QUERY):
+    """Reads plates from a SQLite database (.db/.sqlite) or a text/CSV file (first column)."""
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        conn = sqlite3.connect("file:%s?mode=ro" % path, uri=True)
+        try:
+            return [row[0] for row in conn.execute(query) if row[0]]
+        finally:
+            conn.close()
+    plates = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                plates.append(line.split(",", 1)[0])
+    return plates
+
+
+class Allowlist(object):
+    """Authorised plates with exact and OCR-tolerant lookups, reloaded when the source changes."""
+
+    def __init__(self, path=ALLOWLIST_PATH, max_edits=MAX_EDITS, query=SQLITE_QUERY):
+        self.path = path
+        self.max_edits = max_edits
+        self.query = query
+        self.mtime = None
+        self.index = _Index([], max_edits)
+        self.watcher = None
+        self.reload()
+
+    def _source_mtime(self):
+        mtime = os.path.getmtime(self.path)
+        wal = self.path + "-wal"
+        if os.path.exists(wal):
+            mtime = max(mtime, os.path.getmtime(wal))
+        return mtime
+
+    def reload(self):
+        """Rebuilds the index if the source changed. The new index replaces the old one in one step."""
+        try:
+            mtime = self._source_mtime()
+            if mtime == self.mtime:
+                return False
+            index = _Index(read_plates(self.path, self.query), self.max_edits)
+        except (IOError, OSError, sqlite3.Error) as e:
+            print("Fehler beim Laden der Kennzeichenliste %s: %s" % (self.path, e))
+            return False
+        self.index = index
+        self.mtime = mtime
+        print("Kennzeichenliste geladen: %d Einträge" % len(index.exact))
+        return True
+
+    def lookup(self, plate):
+        """Returns the authorised plate matching `plate`, or None."""
+        return self.index.lookup(plate)
+
+    def __contains__(self, plate):
+        return self.lookup(plate) is not None
+
+    def __len__(self):
+        return len(self.index.exact)
+
+    def start_watcher(self, interval=RELOAD_INTERVAL):
+        def watch():
+            while True:
+                time.sleep(interval)
+                self.reload()
+        self.watcher = threading.Thread(target=watch, name="allowlist-watcher", daemon=True)
+        self.watcher.start()
+        return self
@@ -0,0 +1,165 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+import capture
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".h264")
+CSV_FIELDS = ["file", "frame", "detected", "plate", "box", "total_ms", "ocr_ms"]
+
+
+def find_inputs(folder):
+    """All images and videos below `folder`, as paths relative to it, in name order."""
+    inputs = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(capture.IMAGE_EXTENSIONS + VIDEO_EXTENSIONS):
+                inputs.append(os.path.relpath(os.path.join(root, name), folder))
+    return inputs
+
+
+def _record(process, rel, frame_index, frame, tracker, mode):
+    record, timings = process(frame, tracker, mode)
+    return {
+        "file": rel,
+        "frame": frame_index,
+        "detected": record["detected"],
+        "plate": record["text"],
+        "box": record["box"],
+        "total_ms": round(timings["total"] * 1000, 2),
+        "ocr_ms": round(timings.get("ocr", 0.0) * 1000, 2),
+    }
+
+
+def process_file(folder, rel, mode, every):
+    """Runs recognition on one image or every `every`-th frame of a video (in a pool worker)."""
+    # Imported in the worker so every process loads its own OCR engine
+    import LPR as lpr
+    from benchmark import process
+    path = os.path.join(folder, rel)
+    if not rel.lower().endswith(VIDEO_EXTENSIONS):
+        frame = cv2.imread(path)
+        if frame is None:
+            return rel, [], "Fehler beim Laden des Bildes"
+        return rel, [_record(process, rel, 0, frame, None, mode)], None
+
+    rows = []
+    tracker = lpr.PlateTracker()
+    cap = cv2.VideoCapture(path)
+    index = 0
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if index % every == 0:
+            rows.append(_record(process, rel, index, frame, tracker, mode))
+        index += 1
+    cap.release()
+    return rel, rows, None if index else "Fehler beim Lesen des Videos"
+
+
+class ResultWriter(object):
+    """Appends results to a CSV or JSONL file and remembers which inputs are finished."""
+
+    def __init__(self, path):
+        self.path = path
+        self.csv = path.endswith(".csv")
+        self.done = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                if self.csv:
+                    rows = list(csv.DictReader(f))
+                    if rows and not self._ends_with_newline():
+                        rows.pop()  # Row cut off by an interruption; that file is processed again
+                    self.done = set(row["file"] for row in rows if None not in row.values())
+                else:
+                    for line in f:
+                        try:
+                            self.done.add(json.loads(line)["file"])
+                        except ValueError:
+                            pass  # Line cut off by an interruption; that file is processed again
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="" if self.csv else None)
+        if not new and not self._ends_with_newline():
+            self.file.write("\n")  # Terminate a line cut off by an interruption
+        if self.csv:
+            self.writer = csv.DictWriter(self.file, CSV_FIELDS)
+            if new:
+                self.writer.writeheader()
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def write(self, rows):
+        for row in rows:
+            if self.csv:
+                self.writer.writerow(dict(row, box=" ".join(map(str, row["box"] or []))))
+            else:
+                self.file.write(json.dumps(row, separators=(",", ":")) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline LPR re-processing of archived captures (no MQTT)")
+    parser.add_argument("folder", help="directory with images and/or video files")
+    parser.add_argument("--output", default="lpr_results.jsonl", help="results file (.jsonl or .csv)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--preprocess", choices=["full", "pyramid"], default=None,
+                        help="plate localisation path (default: PREPROCESS_MODE in LPR.py)")
+    parser.add_argument("--every", type=int, default=1, help="only process every n-th video frame")
+    args = parser.parse_args()
+
+    writer = ResultWriter(args.output)
+    todo = [rel for rel in find_inputs(args.folder) if rel not in writer.done]
+    print("%d Dateien, %d bereits verarbeitet, %d offen" % (
+        len(todo) + len(writer.done), len(writer.done), len(todo)))
+
+    start = time.monotonic()
+    finished = 0
+    rows_written = 0
+    max_pending = args.workers * 2  # Submit lazily so huge archives do not fill memory
+    pending = set()
+    inputs = iter(todo)
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            while True:
+                for rel in inputs:
+                    pending.add(pool.submit(process_file, args.folder, rel, args.preprocess, args.every))
+                    if len(pending) >= max_pending:
+                        break
+                if not pending:
+                    break
+                completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    rel, rows, error = future.result()
+                    if error:
+                        print("%s: %s" % (rel, error))
+                    # A file counts as done once its rows are written, so an interrupted
+                    # run resumes with the files that were still in progress
+                    writer.write(rows or [{"file": rel, "frame": None, "detected": False,
+                                           "plate": "", "box": None, "total_ms": 0, "ocr_ms": 0}])
+                    rows_written += len(rows)
+                    finished += 1
+                    if finished % 100 == 0:
+                        print("%d/%d Dateien (%.1f/s)" % (
+                            finished, len(todo), finished / (time.monotonic() - start)))
+    except KeyboardInterrupt:
+        print("Abgebrochen, Fortsetzung mit demselben Befehl möglich.")
+    finally:
+        writer.close()
+    print("%d Dateien, %d Ergebnisse in %.1f s -> %s" % (
+        finished, rows_written, time.monotonic() - start, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import time
+import tracemalloc
+
+import cv2
+import LPR as lpr
+import allowlist
+import capture
+
+STAGES = ["grayscale", "pyramid", "filter", "canny", "contours", "crop", "ocr", "total"]
+PERCENTILES = [50, 90, 99]
+
+
+def load_labels(folder):
+    """Reads labels.csv (file,plate) if present; otherwise the plate is the file name up to '_'."""
+    labels = {}
+    path = os.path.join(folder, "labels.csv")
+    if os.path.exists(path):
+        with open(path) as f:
+            for row in csv.reader(f):
+                if len(row) >= 2 and not row[0].startswith("#"):
+                    labels[row[0].strip()] = allowlist.normalise(row[1])
+        return labels
+    for name in os.listdir(folder):
+        if name.lower().endswith(capture.IMAGE_EXTENSIONS):
+            labels[name] = allowlist.normalise(os.path.splitext(name)[0].split("_")[0])
+    return labels
+
+
+def frames(source, label=None):
+    """Yields (name, frame, expected plate) from an image folder or a video file."""
+    if os.path.isdir(source):
+        labels = load_labels(source)
+        for name in sorted(labels):
+            frame = cv2.imread(os.path.join(source, name))
+            if frame is None:
+                print("Fehler beim Laden des Bildes:", name)
+                continue
+            yield name, frame, labels[name]
+        return
+    cap = cv2.VideoCapture(source)
+    index = 0
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        index += 1
+        yield "%s#%d" % (os.path.basename(source), index), frame, label
+    cap.release()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def process(frame, tracker, mode=None):
+    """Runs localisation, crop and OCR on one frame. Returns (record, timings in seconds)."""
+    timings = {}
+    start = time.perf_counter()
+    gray, screenCnt, offset = lpr.locate(frame, tracker, timings, mode)
+    text = ""
+    box = None
+    if screenCnt is not None:
+        t = time.perf_counter()
+        Cropped = lpr.crop(gray, screenCnt, offset)
+        t = lpr.lap(timings, "crop", t)
+        text = allowlist.normalise(lpr.ocr_engine.read_one(Cropped).text)
+        lpr.lap(timings, "ocr", t)
+        box = list(cv2.boundingRect(screenCnt))
+    timings["total"] = time.perf_counter() - start
+    return {"detected": screenCnt is not None, "text": text, "box": box}, timings
+
+
+def run(source, label=None, track=False, mode=None):
+    tracker = lpr.PlateTracker() if track else None
+    records = []
+    stage_times = {stage: [] for stage in STAGES}
+    tracemalloc.start()
+    wall_start = time.perf_counter()
+
+    for name, frame, expected in frames(source, label):
+        record, timings = process(frame, tracker, mode)
+        record["file"] = name
+        record["expected"] = expected
+        if expected:
+            distance = allowlist.edit_distance(record["text"], expected)
+            record["correct"] = record["text"] == expected
+            record["char_accuracy"] = max(0.0, 1 - distance / float(len(expected)))
+        record["timings_ms"] = {k: round(v * 1000, 3) for k, v in timings.items()}
+        records.append(record)
+        for stage in STAGES:
+            stage_times[stage].append(timings.get(stage, 0.0) * 1000)
+
+    wall = time.perf_counter() - wall_start
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    labelled = [r for r in records if r["expected"]]
+    summary = {
+        "frames": len(records),
+        "fps": round(len(records) / wall, 2) if wall else 0.0,
+        "wall_s": round(wall, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+        "peak_python_mb": round(python_peak / (1024.0 * 1024.0), 2),
+        "detection_rate": round(sum(r["detected"] for r in labelled) / float(len(labelled)), 3) if labelled else None,
+        "read_accuracy": round(sum(r["correct"] for r in labelled) / float(len(labelled)), 3) if labelled else None,
+        "char_accuracy": round(sum(r["char_accuracy"] for r in labelled) / float(len(labelled)), 3) if labelled else None,
+        "stages_ms": {},
+    }
+    for stage in STAGES:
+        values = stage_times[stage]
+        stats = {"mean": round(sum(values) / len(values), 3) if values else 0.0}
+        for p in PERCENTILES:
+            stats["p%d" % p] = round(percentile(values, p), 3)
+        summary["stages_ms"][stage] = stats
+    return summary, records
+
+
+def print_summary(summary, baseline=None):
+    print("Frames: %d  FPS: %.2f  Peak RSS: %.1f MB  Python peak: %.2f MB" % (
+        summary["frames"], summary["fps"], summary["peak_rss_mb"], summary["peak_python_mb"]))
+    for key in ("detection_rate", "read_accuracy", "char_accuracy"):
+        if summary[key] is not None:
+            line = "%-15s %.3f" % (key, summary[key])
+            if baseline and baseline.get(key) is not None:
+                line += "  (%+.3f)" % (summary[key] - baseline[key])
+            print(line)
+    print("%-10s %10s %10s %10s %10s" % (("stage", "mean ms") + tuple("p%d" % p for p in PERCENTILES)))
+    for stage in STAGES:
+        stats = summary["stages_ms"][stage]
+        line = "%-10s %10.3f" % (stage, stats["mean"])
+        line += "".join(" %10.3f" % stats["p%d" % p] for p in PERCENTILES)
+        if baseline:
+            old = baseline["stages_ms"].get(stage, {}).get("mean")
+            if old:
+                line += "  (%+.1f%%)" % ((stats["mean"] - old) / old * 100)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LPR speed and accuracy benchmark (no camera or broker needed)")
+    parser.add_argument("source", help="folder of labelled plate images or a video file")
+    parser.add_argument("--label", help="expected plate for every frame of a video file")
+    parser.add_argument("--track", action="store_true", help="use plate tracking between frames")
+    parser.add_argument("--preprocess", choices=sorted(lpr.SEARCH_MODES), default=lpr.PREPROCESS_MODE,
+                        help="plate localisation path")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for the results")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    summary, records = run(args.source, allowlist.normalise(args.label) if args.label else None,
+                           args.track, args.preprocess)
+    result = {
+        "source": args.source,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "opencv": cv2.__version__,
+        "ocr_backend": lpr.ocr_engine.name,
+        "track": args.track,
+        "preprocess": args.preprocess,
+        "summary": summary,
+        "frames": records,
+    }
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["summary"]
+    print_summary(summary, baseline)
+    print("Ergebnisse gespeichert in", args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# Capture configuration
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+RING_SIZE = 4          # Number of frames kept in the ring buffer
+FPS_WINDOW = 60        # Number of frame timestamps used for the FPS estimate
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class RingBuffer(object):
+    """Preallocated ring of frames. The capture thread writes, LPR reads the latest."""
+
+    def __init__(self, size=RING_SIZE, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+        self.size = size
+        self.frames = np.zeros((size, height, width, 3), np.uint8)
+        self.seq = 0  # Sequence number of the newest committed frame (0 = none yet)
+        self.cond = threading.Condition()
+
+    def next_slot(self):
+        """Returns the buffer the next frame should be written into."""
+        return self.frames[self.seq % self.size]
+
+    def commit(self):
+        with self.cond:
+            self.seq += 1
+            self.cond.notify_all()
+
+    def latest(self, out=None, after=0, timeout=None):
+        """Copies the newest frame into `out` once a frame newer than `after` exists.
+
+        Returns (seq, frame) or (0, None) on timeout.
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > after, timeout):
+                return 0, None
+            seq = self.seq
+            slot = self.frames[(seq - 1) % self.size]
+            if out is None:
+                out = slot.copy()
+            else:
+                np.copyto(out, slot)
+        return seq, out
+
+
+def _fit(frame, out):
+    """Copies `frame` into the preallocated `out`, resizing if the source differs."""
+    if frame.shape == out.shape:
+        if frame is not out:
+            np.copyto(out, frame)
+    else:
+        cv2.resize(frame, (out.shape[1], out.shape[0]), dst=out)
+
+
+class VideoCaptureBackend(object):
+    """V4L2 camera device (e.g. /dev/video0 or index 0) via cv2.VideoCapture."""
+
+    def __init__(self, device=0, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+        if isinstance(device, int):
+            self.cap = cv2.VideoCapture(device, cv2.CAP_V4L2)
+        else:
+            self.cap = cv2.VideoCapture(device)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Always hand out the freshest frame
+        if not self.cap.isOpened():
+            raise IOError("Could not open camera device: %s" % device)
+
+    def read(self, out):
+        ok, frame = self.cap.read(out)
+        if not ok or frame is None:
+            return False
+        _fit(frame, out)
+        return True
+
+    def close(self):
+        self.cap.release()
+
+
+class VideoFileBackend(object):
+    """Recorded video file. With `realtime` the file is paced at its native FPS."""
+
+    def __init__(self, path, loop=False, realtime=False):
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError("Could not open video file: %s" % path)
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_interval = 1.0 / fps if realtime and fps > 0 else 0
+        self.next_time = time.monotonic()
+
+    def read(self, out):
+        ok, frame = self.cap.read()
+        if not ok and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read()
+        if not ok:
+            return False
+        _fit(frame, out)
+        if self.frame_interval:
+            self.next_time += self.frame_interval
+            delay = self.next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return True
+
+    def close(self):
+        self.cap.release()
+
+
+class ImageDirBackend(object):
+    """Directory of still images, replayed in file name order."""
+
+    def __init__(self, path, loop=False, interval=0):
+        self.files = sorted(
+            os.path.join(path, f) for f in os.listdir(path)
+            if f.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.files:
+            raise IOError("No images found in: %s" % path)
+        self.loop = loop
+        self.interval = interval
+        self.index = 0
+
+    def read(self, out):
+        while True:
+            if self.index >= len(self.files):
+                if not self.loop:
+                    return False
+                self.index = 0
+            path = self.files[self.index]
+            self.index += 1
+            frame = cv2.imread(path)
+            if frame is None:
+                print("Fehler beim Laden des Bildes:", path)
+                continue
+            _fit(frame, out)
+            if self.interval:
+                time.sleep(self.interval)
+            return True
+
+    def close(self):
+        pass
+
+
+def open_backend(source, loop=False):
+    """Picks a backend from a source spec: device index, /dev/videoN, directory or video file."""
+    if isinstance(source, int) or str(source).isdigit():
+        return VideoCaptureBackend(int(source))
+    if str(source).startswith("/dev/video"):
+        return VideoCaptureBackend(source)
+    if os.path.isdir(source):
+        return ImageDirBackend(source, loop=loop)
+    return VideoFileBackend(source, loop=loop)
+
+
+class FrameSource(object):
+    """Long-lived capture thread filling a RingBuffer from a backend."""
+
+    def __init__(self, backend, ring=None):
+        self.backend = backend
+        self.ring = ring or RingBuffer()
+        self.running = False
+        self.finished = threading.Event()
+        self.thread = None
+        self.frame_count = 0
+        self.start_time = None
+        self.timestamps = deque(maxlen=FPS_WINDOW)
+
+    def start(self):
+        self.running = True
+        self.start_time = time.monotonic()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            while self.running:
+                if not self.backend.read(self.ring.next_slot()):
+                    break
+                self.ring.commit()
+                self.frame_count += 1
+                self.timestamps.append(time.monotonic())
+        finally:
+            self.running = False
+            self.finished.set()
+            # Wake up readers waiting for a frame that will never come
+            with self.ring.cond:
+                self.ring.cond.notify_all()
+
+    def read(self, out=None, after=0, timeout=1.0):
+        """Returns (seq, frame) for the newest frame after `after`, (0, None) if none arrives."""
+        return self.ring.latest(out, after, timeout)
+
+    @property
+    def fps(self):
+        """Sustained capture rate over the last FPS_WINDOW frames."""
+        ts = self.timestamps
+        if len(ts) < 2 or ts[-1] == ts[0]:
+            return 0.0
+        return (len(ts) - 1) / (ts[-1] - ts[0])
+
+    @property
+    def average_fps(self):
+        if not self.start_time or not self.frame_count:
+            return 0.0
+        return self.frame_count / (time.monotonic() - self.start_time)
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+        self.backend.close()
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import Counter, namedtuple
+
+# Consensus configuration
+MIN_READS = 3           # OCR reads needed before voting
+WINDOW = 3.0            # seconds; older reads are discarded
+MIN_CONFIDENCE = 0.6    # Minimum vote agreement (0..1) to confirm a plate
+REPEAT_TTL = 60.0       # seconds; the same plate is not confirmed again within this time
+LEAVE_FRAMES = 10       # Frames in a row without a plate before the vehicle counts as gone
+LEAVE_TIME = WINDOW     # seconds without any plate detection before the vehicle counts as gone
+
+Confirmed = namedtuple("Confirmed", ["plate", "confidence", "reads"])
+
+
+def vote(reads):
+    """Per-character majority vote over (text, weight) reads.
+
+    The plate length is voted first; only reads of the winning length vote on characters.
+    Returns (plate, confidence) where confidence is the mean per-character agreement.
+    """
+    lengths = Counter()
+    for text, weight in reads:
+        lengths[len(text)] += weight
+    length = lengths.most_common(1)[0][0]
+    same_length = [(text, weight) for text, weight in reads if len(text) == length]
+    total = float(sum(weight for _, weight in reads))
+
+    plate = []
+    agreement = 0.0
+    for i in range(length):
+        chars = Counter()
+        for text, weight in same_length:
+            chars[text[i]] += weight
+        char, votes = chars.most_common(1)[0]
+        plate.append(char)
+        agreement += votes / total
+    confidence = agreement / length if length else 0.0
+    return "".join(plate), confidence
+
+
+class PlateConsensus(object):
+    """Collects OCR reads of the vehicle in front of the camera and confirms one plate per vehicle."""
+
+    def __init__(self, min_reads=MIN_READS, window=WINDOW, min_confidence=MIN_CONFIDENCE,
+                 ttl=REPEAT_TTL, leave_frames=LEAVE_FRAMES, leave_time=LEAVE_TIME):
+        self.min_reads = min_reads
+        self.window = window
+        self.min_confidence = min_confidence
+        self.ttl = ttl
+        self.leave_frames = leave_frames
+        self.leave_time = leave_time
+        self.reads = []          # (timestamp, text, weight)
+        self.recent = {}         # plate -> time it was last confirmed
+        self.vehicle_done = False
+        self.misses = 0          # Frames in a row without a plate
+        self.last_seen = None    # Time of the last plate detection
+        self.confirmed = 0
+        self.suppressed = 0
+        self.lock = threading.Lock()
+
+    def add(self, text, confidence=None, now=None):
+        """Adds one OCR read. Returns a Confirmed tuple when a new plate is confirmed, else None."""
+        text = text.strip().upper()
+        if not text:
+            return None
+        now = time.monotonic() if now is None else now
+        # OCR confidence is 0..100 (or None for backends that do not report it)
+        weight = max(confidence, 1) / 100.0 if confidence is not None else 1.0
+
+        with self.lock:
+            self.reads = [r for r in self.reads if now - r[0] <= self.window]
+            self.reads.append((now, text, weight))
+            if len(self.reads) < self.min_reads:
+                return None
+
+            plate, score = vote([(t, w) for _, t, w in self.reads])
+            if score < self.min_confidence:
+                # Not sure yet: keep collecting, the oldest read falls out first
+                self.reads.pop(0)
+                return None
+
+            count = len(self.reads)
+            self.reads = []
+            self.vehicle_done = True
+            self.recent = {p: t for p, t in self.recent.items() if now - t < self.ttl}
+            if plate in self.recent:
+                self.suppressed += 1
+                return None
+            self.recent[plate] = now
+            self.confirmed += 1
+            return Confirmed(plate, round(score, 2), count)
+
+    def detected(self, now=None):
+        """Called for every frame in which a plate was found (whether or not it is OCRed)."""
+        with self.lock:
+            self.misses = 0
+            self.last_seen = time.monotonic() if now is None else now
+
+    def missed(self, now=None):
+        """Called for every frame without a plate.
+
+        Single misses are normal while a car waits, so the vehicle only counts as gone
+        after `leave_frames` misses in a row or `leave_time` seconds without a detection.
+        Returns True if the vehicle was considered gone.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.misses += 1
+            gone = self.misses >= self.leave_frames or (
+                self.last_seen is not None and now - self.last_seen > self.leave_time)
+        if gone:
+            self.vehicle_left()
+        return gone
+
+    def vehicle_left(self):
+        """The next plate belongs to a new vehicle."""
+        with self.lock:
+            self.reads = []
+            self.vehicle_done = False
+            self.misses = 0
+            self.last_seen = None
+
+    def stats(self):
+        return {"confirmed": self.confirmed, "suppressed": self.suppressed}
@@ -1,34 +1,77 @@
+import argparse
 import cv2
 import LPR as lpr
-import subprocess
-import os
-
-filename = 'capture'
-i=0
-
-while True:
-
-    i += 1
-    
-    with open(os.devnull, 'w') as FNULL:
-      retcode = subprocess.call(
-          ['fswebcam', '-r', '640x480', '--no-banner', filename + str(i) + ".jpg"],
-          stdout=FNULL,
-          stderr=FNULL
-      )
-    if retcode != 0:
-        print("Fehler beim Aufnehmen mit fswebcam")
-        break
-
-    frame = cv2.imread(filename+str(i)+".jpg")
-
-    if frame is None:
-        print("Fehler beim Laden des Bildes:", filename+str(i)+".jpg")
-    else:
-        lpr.rec(frame)
-        
-    if os.path.exists(filename+str(i)+".jpg"):
-      os.remove(filename+str(i)+".jpg")
-
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+import capture
+import motion
+import pipeline
+import time
+
+FPS_REPORT_INTERVAL = 10  # seconds
+
+parser = argparse.ArgumentParser(description="License plate recognition")
+parser.add_argument("source", nargs="?", default=0,
+                    help="camera index, /dev/videoN, a video file or a directory of images")
+parser.add_argument("--pipeline", action="store_true",
+                    help="run capture, localisation and OCR as separate stages on all cores")
+parser.add_argument("--no-motion-gate", action="store_true",
+                    help="run plate detection on every frame, even if nothing moved")
+parser.add_argument("--preprocess", choices=sorted(lpr.SEARCH_MODES), default=lpr.PREPROCESS_MODE,
+                    help="plate localisation path: full resolution or downscaled pyramid level")
+args = parser.parse_args()
+
+SOURCE = args.source
+lpr.PREPROCESS_MODE = args.preprocess
+
+lpr.client.start()
+source = capture.FrameSource(capture.open_backend(SOURCE)).start()
+gate = None if args.no_motion_gate else motion.MotionGate()
+
+
+def run_pipeline():
+    pipe = pipeline.Pipeline(source, gate).start()
+    try:
+        while pipe.running:
+            time.sleep(FPS_REPORT_INTERVAL)
+            print("Pipeline:", pipe.stats())
+    except KeyboardInterrupt:
+        pass
+    pipe.stop()
+
+
+def run_sequential():
+    frame = None
+    seq = 0
+    last_report = time.monotonic()
+
+    while True:
+
+        new_seq, img = source.read(frame, after=seq)
+
+        if img is None:
+            if source.finished.is_set():
+                print("Keine weiteren Bilder von der Quelle:", SOURCE)
+                break
+            print("Fehler beim Aufnehmen: kein Bild von", SOURCE)
+            continue
+
+        seq, frame = new_seq, img
+        if gate is None or gate.check(frame):
+            lpr.rec(frame)
+
+        if time.monotonic() - last_report > FPS_REPORT_INTERVAL:
+            print("Capture FPS: %.1f" % source.fps)
+            if gate is not None:
+                print("Motion gate:", gate.stats())
+            print("MQTT:", lpr.client.stats())
+            last_report = time.monotonic()
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+
+if args.pipeline:
+    run_pipeline()
+else:
+    run_sequential()
+
+source.stop()
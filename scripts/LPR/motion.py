@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+
+# Motion gate configuration
+GATE_WIDTH = 160            # Width of the downscaled grayscale frame used for differencing
+PIXEL_THRESHOLD = 25        # Per-pixel intensity change that counts as "changed"
+MIN_CHANGED_FRACTION = 0.01 # Fraction of ROI pixels that must change to count as motion
+BACKGROUND_RATE = 0.05      # How fast the reference frame adapts to slow light changes
+HOLD_FRAMES = 15            # Frames still passed on after the last motion (car stopped at barrier)
+# Region of interest (approach lane) as fractions of the frame: (x, y, width, height)
+ROI = (0.0, 0.0, 1.0, 1.0)
+
+
+class MotionGate(object):
+    """Cheap frame differencing that decides whether a frame is worth full plate detection."""
+
+    def __init__(self, roi=ROI, pixel_threshold=PIXEL_THRESHOLD,
+                 min_changed=MIN_CHANGED_FRACTION, width=GATE_WIDTH,
+                 background_rate=BACKGROUND_RATE, hold_frames=HOLD_FRAMES):
+        self.roi = roi
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.width = width
+        self.background_rate = background_rate
+        self.hold_frames = hold_frames
+        self.source_shape = None
+        self.small = None
+        self.gray = None
+        self.ref = None
+        self.background = None
+        self.diff = None
+        self.mask = None
+        self.hold = 0
+        self.passed = 0
+        self.skipped = 0
+
+    def _allocate(self, shape):
+        h, w = shape[:2]
+        height = max(1, int(round(h * self.width / float(w))))
+        self.small = np.empty((height, self.width, 3), np.uint8)
+        self.gray = np.empty((height, self.width), np.uint8)
+        self.ref = np.empty((height, self.width), np.uint8)
+        self.diff = np.empty((height, self.width), np.uint8)
+        self.mask = np.empty((height, self.width), np.uint8)
+        rx, ry, rw, rh = self.roi
+        self.roi_slice = (slice(int(ry * height), int((ry + rh) * height)),
+                          slice(int(rx * self.width), int((rx + rw) * self.width)))
+        self.background = None
+
+    def changed(self, frame):
+        """Returns True if the approach lane changed since the reference frame."""
+        if self.small is None or self.source_shape != frame.shape:
+            self.source_shape = frame.shape
+            self._allocate(frame.shape)
+
+        cv2.resize(frame, (self.width, self.gray.shape[0]), dst=self.small,
+                   interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+
+        if self.background is None:
+            self.background = self.gray.astype(np.float32)
+            return True
+
+        cv2.convertScaleAbs(self.background, dst=self.ref)
+        cv2.absdiff(self.gray, self.ref, dst=self.diff)
+        cv2.threshold(self.diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=self.mask)
+        roi = self.mask[self.roi_slice]
+        fraction = cv2.countNonZero(roi) / float(roi.size) if roi.size else 0.0
+        cv2.accumulateWeighted(self.gray, self.background, self.background_rate)
+        return fraction >= self.min_changed
+
+    def check(self, frame):
+        """Gate decision including the hold period. Counts passed and skipped frames."""
+        if self.changed(frame):
+            self.hold = self.hold_frames
+        elif self.hold > 0:
+            self.hold -= 1
+        else:
+            self.skipped += 1
+            return False
+        self.passed += 1
+        return True
+
+    def stats(self):
+        return {"passed": self.passed, "skipped": self.skipped}
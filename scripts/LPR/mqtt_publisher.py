@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque
+
+import paho.mqtt.client as mqtt
+
+# MQTT configuration
+MQTT_BROKER = "10.0.0.1"
+MQTT_PORT = 1883
+KEEPALIVE = 60
+RECONNECT_MIN_DELAY = 1     # seconds, doubled after every failed attempt
+RECONNECT_MAX_DELAY = 30    # seconds
+OUTBOX_SIZE = 100           # Messages kept while disconnected; the oldest are dropped
+MAX_AGE = 5.0               # seconds; queued messages older than this are dropped, not sent
+LATENCY_WINDOW = 100        # Number of publish latencies kept for statistics
+
+
+class Publisher(object):
+    """One long-lived MQTT connection with a background network loop.
+
+    Messages published while the broker is unreachable are kept in a bounded outbox and sent
+    after the automatic reconnect, unless they are older than `max_age`: a plate read is only
+    useful while the car is still waiting at the barrier.
+    """
+
+    def __init__(self, host=MQTT_BROKER, port=MQTT_PORT, keepalive=KEEPALIVE,
+                 outbox_size=OUTBOX_SIZE, max_age=MAX_AGE):
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.client = mqtt.Client()
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        self.client.reconnect_delay_set(RECONNECT_MIN_DELAY, RECONNECT_MAX_DELAY)
+        # paho keeps QoS>0 messages it could not send and resends them itself; bound that queue too
+        self.client.max_queued_messages_set(outbox_size)
+        self.outbox = deque(maxlen=outbox_size)
+        self.max_age = max_age
+        self.dropped = 0
+        self.pending = {}   # mid -> publish start time
+        self.early = {}     # mid -> ack time, if the ack arrived before publish() returned
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.connected = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        # connect_async + loop_start: the network thread connects and reconnects with backoff
+        self.client.connect_async(self.host, self.port, self.keepalive)
+        self.client.loop_start()
+        return self
+
+    def stop(self):
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    def _on_connect(self, client, userdata, flags, rc, *args):
+        if rc != 0:
+            print("Verbindung zum MQTT Broker fehlgeschlagen, Rückgabecode:", rc)
+            return
+        print("Mit MQTT Broker verbunden: %s:%d" % (self.host, self.port))
+        now = time.monotonic()
+        with self.lock:
+            self.connected = True
+            queued = [m for m in self.outbox if now - m[4] <= self.max_age]
+            stale = len(self.outbox) - len(queued)
+            self.dropped += stale
+            self.outbox.clear()
+        if stale:
+            print("%d veraltete Nachrichten verworfen (älter als %g s)" % (stale, self.max_age))
+        for topic, payload, qos, retain, queued_at in queued:
+            self._send(topic, payload, qos, retain, queued_at)
+
+    def _on_disconnect(self, client, userdata, *args):
+        with self.lock:
+            self.connected = False
+        print("MQTT Verbindung getrennt, neuer Versuch im Hintergrund...")
+
+    def _on_publish(self, client, userdata, mid, *args):
+        now = time.monotonic()
+        with self.lock:
+            start = self.pending.pop(mid, None)
+            if start is None:
+                self.early[mid] = now
+            else:
+                self.latencies.append(now - start)
+
+    def _send(self, topic, payload, qos, retain, start):
+        info = self.client.publish(topic, payload, qos=qos, retain=retain)
+        # On NO_CONN paho has kept a QoS>0 message for the reconnect; queuing it here as
+        # well would send it twice
+        kept = info.rc == mqtt.MQTT_ERR_NO_CONN and qos > 0
+        if info.rc != mqtt.MQTT_ERR_SUCCESS and not kept:
+            self._queue(topic, payload, qos, retain, start)
+            return
+        with self.lock:
+            acked = self.early.pop(info.mid, None)
+            if acked is None:
+                self.pending[info.mid] = start
+            else:
+                self.latencies.append(acked - start)
+
+    def _queue(self, topic, payload, qos, retain, start):
+        with self.lock:
+            if len(self.outbox) == self.outbox.maxlen:
+                self.dropped += 1
+            self.outbox.append((topic, payload, qos, retain, start))
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        """Sends now if connected, otherwise queues the message for the next connection.
+
+        QoS 0 by default: with QoS>0 paho would keep unsent messages and replay them after
+        a reconnect regardless of their age, bypassing `max_age`.
+        """
+        start = time.monotonic()
+        if self.connected:
+            self._send(topic, payload, qos, retain, start)
+        else:
+            self._queue(topic, payload, qos, retain, start)
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            queued = len(self.outbox)
+        stats = {"connected": self.connected, "queued": queued, "dropped": self.dropped}
+        if latencies:
+            stats["latency_ms_avg"] = round(sum(latencies) / len(latencies) * 1000, 1)
+            stats["latency_ms_p95"] = round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1)
+        return stats
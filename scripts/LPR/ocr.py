@@ -0,0 +1,98 @@
+import threading
+from collections import namedtuple
+
+# OCR configuration
+OCR_BACKEND = "auto"   # "auto", "tesserocr" or "pytesseract"
+OCR_LANG = "eng"
+CHAR_WHITELIST = "ABCDEFGHIJKLMNOPRSTUVYZ0123456789"
+PAGE_SEG_MODE = None   # Tesseract default; 7 treats the crop as a single text line
+
+OcrResult = namedtuple("OcrResult", ["text", "confidence"])
+
+
+class OcrBackend(object):
+    """Reads plate text from grayscale crops. `read` takes a list and returns one OcrResult per crop."""
+
+    name = "base"
+
+    def read(self, crops):
+        raise NotImplementedError
+
+    def read_one(self, crop):
+        return self.read([crop])[0]
+
+    def close(self):
+        pass
+
+
+class TesserocrBackend(OcrBackend):
+    """Resident Tesseract engine via the C API: the model and whitelist are loaded once."""
+
+    name = "tesserocr"
+
+    def __init__(self, lang=OCR_LANG, whitelist=CHAR_WHITELIST, psm=PAGE_SEG_MODE):
+        from tesserocr import PyTessBaseAPI
+        if psm is None:
+            self.api = PyTessBaseAPI(lang=lang)
+        else:
+            self.api = PyTessBaseAPI(lang=lang, psm=psm)
+        self.api.SetVariable("tessedit_char_whitelist", whitelist)
+        self.lock = threading.Lock()  # One engine instance, calls must not interleave
+
+    def read(self, crops):
+        results = []
+        with self.lock:
+            for crop in crops:
+                if crop is None or crop.size == 0:
+                    results.append(OcrResult("", 0))
+                    continue
+                h, w = crop.shape[:2]
+                bpp = 1 if crop.ndim == 2 else crop.shape[2]
+                self.api.SetImageBytes(crop.tobytes(), w, h, bpp, w * bpp)
+                text = self.api.GetUTF8Text().strip()
+                results.append(OcrResult(text, self.api.MeanTextConf()))
+        return results
+
+    def close(self):
+        self.api.End()
+
+
+class PytesseractBackend(OcrBackend):
+    """Fallback: starts one tesseract process per crop."""
+
+    name = "pytesseract"
+
+    def __init__(self, lang=OCR_LANG, whitelist=CHAR_WHITELIST, psm=PAGE_SEG_MODE):
+        import pytesseract
+        self.pytesseract = pytesseract
+        self.lang = lang
+        self.config = "-c tessedit_char_whitelist=%s" % whitelist
+        if psm is not None:
+            self.config = "--psm %d %s" % (psm, self.config)
+
+    def read(self, crops):
+        results = []
+        for crop in crops:
+            if crop is None or crop.size == 0:
+                results.append(OcrResult("", 0))
+                continue
+            text = self.pytesseract.image_to_string(crop, lang=self.lang, config=self.config)
+            results.append(OcrResult(text.strip(), None))
+        return results
+
+
+BACKENDS = {
+    TesserocrBackend.name: TesserocrBackend,
+    PytesseractBackend.name: PytesseractBackend,
+}
+
+
+def get_backend(name=OCR_BACKEND):
+    """Creates the requested backend. "auto" prefers the resident engine and falls back to pytesseract."""
+    if name != "auto":
+        return BACKENDS[name]()
+    try:
+        return TesserocrBackend()
+    except (ImportError, RuntimeError) as e:
+        print("tesserocr nicht verfügbar (%s), nutze pytesseract" % e)
+        return PytesseractBackend()
@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import deque
+
+import LPR as lpr
+
+# Pipeline configuration
+QUEUE_SIZE = 2          # Bounded queue length between stages; the oldest item is dropped when full
+LOCATE_WORKERS = 3      # Plate localisation threads (OpenCV releases the GIL, so these use the other cores)
+OCR_WORKERS = 1
+THROUGHPUT_WINDOW = 30  # Number of timestamps used for the throughput estimate
+
+
+class DropOldestQueue(object):
+    """Bounded queue that discards the oldest item instead of blocking the producer."""
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self.items = deque(maxlen=maxsize)
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Returns the oldest item, or None on timeout or once the queue is closed and empty."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class Stage(object):
+    """Runs `func` on items from `inbox` in worker threads and forwards non-None results to `outbox`."""
+
+    def __init__(self, name, func, inbox, outbox=None, workers=1):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.threads = []
+        self.running = False
+        self.processed = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self.timestamps = deque(maxlen=THROUGHPUT_WINDOW)
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.running = True
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name="%s-%d" % (self.name, i), daemon=True)
+            t.start()
+            self.threads.append(t)
+        return self
+
+    def _run(self):
+        while self.running:
+            item = self.inbox.get(timeout=0.5)
+            if item is None:
+                if self.inbox.closed:
+                    break
+                continue
+            start = time.monotonic()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                print("Fehler in Stufe %s: %s" % (self.name, e))
+                with self.lock:
+                    self.errors += 1
+                continue
+            end = time.monotonic()
+            with self.lock:
+                self.processed += 1
+                self.busy_time += end - start
+                self.timestamps.append(end)
+            if result is not None and self.outbox is not None:
+                self.outbox.put(result)
+
+    @property
+    def throughput(self):
+        """Items per second over the last THROUGHPUT_WINDOW items."""
+        ts = self.timestamps
+        if len(ts) < 2 or ts[-1] == ts[0]:
+            return 0.0
+        return (len(ts) - 1) / (ts[-1] - ts[0])
+
+    def stats(self):
+        with self.lock:
+            avg = self.busy_time / self.processed if self.processed else 0.0
+            return {
+                "queue_depth": len(self.inbox),
+                "dropped": self.inbox.dropped,
+                "processed": self.processed,
+                "errors": self.errors,
+                "throughput": round(self.throughput, 2),
+                "avg_ms": round(avg * 1000, 1),
+            }
+
+    def stop(self):
+        self.running = False
+        self.inbox.close()
+        for t in self.threads:
+            t.join(timeout=2)
+
+
+def _locate(frame):
+    gray, screenCnt, offset = lpr.locate(frame)
+    if screenCnt is None:
+        lpr.consensus.missed()
+        return None
+    lpr.consensus.detected()
+    if not lpr.needs_ocr():
+        return None
+    # Copy: the pyramid path reuses its buffers for the next frame
+    return lpr.crop(gray, screenCnt, offset).copy()
+
+
+class Pipeline(object):
+    """Capture -> plate localisation -> OCR/publish, each stage on its own threads."""
+
+    def __init__(self, source, gate=None, locate_workers=LOCATE_WORKERS,
+                 ocr_workers=OCR_WORKERS, queue_size=QUEUE_SIZE):
+        self.source = source
+        self.gate = gate
+        self.running = False
+        self.capture_thread = None
+        self.captured = 0
+        self.frames = DropOldestQueue(queue_size)
+        self.crops = DropOldestQueue(queue_size)
+        self.locate_stage = Stage("locate", _locate, self.frames, self.crops, locate_workers)
+        self.ocr_stage = Stage("ocr", lpr.read_plate, self.crops, None, ocr_workers)
+
+    def start(self):
+        self.running = True
+        self.ocr_stage.start()
+        self.locate_stage.start()
+        self.capture_thread = threading.Thread(target=self._capture, name="capture", daemon=True)
+        self.capture_thread.start()
+        return self
+
+    def _capture(self):
+        seq = 0
+        while self.running:
+            new_seq, frame = self.source.read(after=seq)
+            if frame is None:
+                if self.source.finished.is_set():
+                    break
+                continue
+            seq = new_seq
+            self.captured += 1
+            if self.gate is not None and not self.gate.check(frame):
+                continue
+            self.frames.put(frame)
+        self.running = False
+
+    def stats(self):
+        stats = {
+            "capture": {"fps": round(self.source.fps, 2), "frames": self.captured},
+            "locate": self.locate_stage.stats(),
+            "ocr": self.ocr_stage.stats(),
+            "consensus": lpr.consensus.stats(),
+            "mqtt": lpr.client.stats(),
+        }
+        if self.gate is not None:
+            stats["motion"] = self.gate.stats()
+        return stats
+
+    def stop(self):
+        self.running = False
+        if self.capture_thread:
+            self.capture_thread.join(timeout=2)
+        self.locate_stage.stop()
+        self.ocr_stage.stop()
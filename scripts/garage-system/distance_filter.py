@@ -0,0 +1,81 @@
+import bisect
+import time
+from collections import deque
+
+
+class RunningMedian:
+    """Median of the last `window` samples. Cost per sample depends only on the window size."""
+
+    def __init__(self, window=7):
+        self.samples = deque(maxlen=window)
+        self.ordered = []
+
+    def add(self, value):
+        if len(self.samples) == self.samples.maxlen:
+            oldest = self.samples[0]
+            del self.ordered[bisect.bisect_left(self.ordered, oldest)]
+        self.samples.append(value)
+        bisect.insort(self.ordered, value)
+        n = len(self.ordered)
+        if n % 2:
+            return self.ordered[n // 2]
+        return (self.ordered[n // 2 - 1] + self.ordered[n // 2]) / 2.0
+
+
+class Ema:
+    """Exponential moving average."""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.value = None
+
+    def add(self, value):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class OccupancyFilter:
+    """Turns raw distance samples into confirmed occupied/free changes.
+
+    Occupied is entered below `enter_threshold` and left above `exit_threshold`
+    (hysteresis). A new state must hold for `min_dwell` seconds before it is confirmed.
+    """
+
+    def __init__(self, enter_threshold, exit_threshold, min_dwell=1.0,
+                 mode="median", window=7, alpha=0.3, occupied=False):
+        if exit_threshold < enter_threshold:
+            raise ValueError("exit_threshold must not be below enter_threshold")
+        self.enter_threshold = enter_threshold
+        self.exit_threshold = exit_threshold
+        self.min_dwell = min_dwell
+        self.smoother = RunningMedian(window) if mode == "median" else Ema(alpha)
+        self.occupied = occupied
+        self.distance = None
+        self.candidate_since = None
+
+    def update(self, distance, now=None):
+        """Adds one sample (ignored if negative). Returns True if the confirmed state changed."""
+        if distance is None or distance < 0:
+            return False
+        now = time.monotonic() if now is None else now
+        self.distance = self.smoother.add(distance)
+
+        if self.occupied:
+            wants_change = self.distance > self.exit_threshold
+        else:
+            wants_change = self.distance < self.enter_threshold
+
+        if not wants_change:
+            self.candidate_since = None
+            return False
+        if self.candidate_since is None:
+            self.candidate_since = now
+        if now - self.candidate_since < self.min_dwell:
+            return False
+
+        self.occupied = not self.occupied
+        self.candidate_since = None
+        return True
@@ -2,12 +2,15 @@ import time
 import paho.mqtt.client as mqtt
 from gpiozero import LED, MotionSensor, DistanceSensor
 import json
+from distance_filter import OccupancyFilter
+from garage_controller import GarageController
 
 # MQTT Configuration
 MQTT_BROKER = "10.0.0.1"
 MQTT_PORT = 1883
 MQTT_TOPIC_GARAGE_CONTROL = "barrier"  # Topic to listen for garage control commands
 MQTT_TOPIC_GARAGE_STATUS = "garage"    # Topic to publish garage status
+MQTT_TOPIC_GARAGE_OCCUPANCY = "garage/occupancy"  # Confirmed occupancy changes with filtered distance
 
 # GPIO Pins
 MOTION_SENSOR_PIN = 16      # HC SR501 Motion Sensor
@@ -32,12 +35,18 @@ distance_sensor = DistanceSensor(
 )
 
 # Sensor Configuration
-DISTANCE_THRESHOLD = 0.1  # Threshold in meters to consider garage occupied
+ENTER_THRESHOLD = 0.10    # Filtered distance in meters below which the garage becomes occupied
+EXIT_THRESHOLD = 0.15     # Filtered distance in meters above which the garage becomes free again
+MIN_DWELL = 1.0           # Seconds a new state must hold before it is published
+SAMPLE_RATE = 10          # Distance samples per second
+FILTER_MODE = "median"    # "median" (running median) or "ema" (exponential moving average)
+FILTER_WINDOW = 7         # Samples in the running median
+EMA_ALPHA = 0.3           # Smoothing factor for the EMA
+
+occupancy = OccupancyFilter(ENTER_THRESHOLD, EXIT_THRESHOLD, MIN_DWELL,
+                            mode=FILTER_MODE, window=FILTER_WINDOW, alpha=EMA_ALPHA)
 
-# Global state variables
 client = None
-garage_occupied = False
-is_opening_garage = False # Flag indicating if the garage opening sequence is active
 
 def get_distance():
     try:
@@ -46,37 +55,26 @@ def get_distance():
         print(f"Fehler beim Lesen des Abstands: {e}")
         return -1 # Return -1 on error
 
-def is_garage_occupied():
-    distance = get_distance()
-    if distance == -1:
-        print("Warnung: Konnte Abstand nicht lesen, nehme 'nicht belegt' an.")
-        return False # Assume free on error to avoid blocking
-    return distance < DISTANCE_THRESHOLD
-
-def blink_specific_led(led_obj, duration=5, blink_time=0.2):
-    """Blinks a specific LED for a given duration."""
-    end_time = time.time() + duration
-    led_obj.off()
-    time.sleep(0.01) 
-    
-    while time.time() < end_time:
-        led_obj.on()
-        time.sleep(blink_time)
-        led_obj.off()
-        time.sleep(blink_time)
-    led_obj.off()
-
-def update_leds(occupied_status):
-    """Updates LEDs based on garage status, unless an opening sequence is active."""
-    if is_opening_garage:
-        return # LED control is handled by open_garage_procedure during opening
-
-    if occupied_status:
-        green_led.off()
-        red_led.on()
-    else:
-        green_led.on()
-        red_led.off()
+def prime_occupancy():
+    """Fills the filter with a few samples and takes their result as the start state."""
+    for _ in range(FILTER_WINDOW):
+        distance = get_distance()
+        if distance == -1:
+            print("Warnung: Konnte Abstand nicht lesen.")
+        occupancy.update(distance)
+        time.sleep(1.0 / SAMPLE_RATE)
+    if occupancy.distance is None:
+        print("Warnung: Kein gültiger Abstand, nehme 'nicht belegt' an.")
+        return
+    occupancy.occupied = occupancy.distance < ENTER_THRESHOLD
+
+def publish(topic, payload, retain=False):
+    if client and client.is_connected():
+        client.publish(topic, payload, retain=retain)
+
+# Garage state machine; runs on its own thread so the MQTT thread is never blocked
+controller = GarageController(green_led, red_led, motion_sensor, occupancy, publish,
+                              MQTT_TOPIC_GARAGE_STATUS, MQTT_TOPIC_GARAGE_OCCUPANCY)
 
 def on_connect(mqtt_client, userdata, flags, rc, properties=None):
     if rc == 0:
@@ -86,97 +84,27 @@ def on_connect(mqtt_client, userdata, flags, rc, properties=None):
     else:
         print(f"Verbindung zum MQTT Broker fehlgeschlagen, Rückgabecode: {rc}")
 
-def open_garage_procedure():
-    """Handles the garage opening sequence, including safety checks."""
-    global is_opening_garage, garage_occupied, client
-
-    if is_opening_garage: # Prevent concurrent execution
-        print("Öffnungsvorgang läuft bereits.")
-        return
-
-    print("Öffnungsanfrage für Garage erhalten. Prüfe Bedingungen...")
-    current_garage_occupied = is_garage_occupied()
-
-    if not current_garage_occupied and not motion_sensor.is_active:
-        print("Bedingungen erfüllt. Garage wird geöffnet (grüne LED blinkt für 10s).")
-        is_opening_garage = True
-        if client and client.is_connected():
-            client.publish(MQTT_TOPIC_GARAGE_STATUS, "opening")
-
-        red_led.off()
-        green_led.off()
-
-        opening_duration = 10  # seconds
-        blink_interval = 0.25
-        end_opening_time = time.time() + opening_duration
-        
-        green_led_currently_on = False
-        while time.time() < end_opening_time:
-            if motion_sensor.is_active:
-                print("BEWEGUNG WÄHREND DES ÖFFNENS ERKANNT (LICHTSCHRANKE)!")
-                is_opening_garage = False
-                green_led.off()
-                if client and client.is_connected():
-                    client.publish(MQTT_TOPIC_GARAGE_STATUS, "interrupted_by_motion")
-                
-                print("Rote LED blinkt für 5 Sekunden.")
-                blink_specific_led(red_led, duration=5, blink_time=0.2)
-                
-                garage_occupied = is_garage_occupied()
-                update_leds(garage_occupied)
-                if client and client.is_connected():
-                    client.publish(MQTT_TOPIC_GARAGE_STATUS, "occupied" if garage_occupied else "free")
-                return
-
-            if green_led_currently_on:
-                green_led.off()
-            else:
-                green_led.on()
-            green_led_currently_on = not green_led_currently_on
-            time.sleep(blink_interval)
-
-        is_opening_garage = False
-        green_led.off()
-        print("Garagenöffnung (simuliert) abgeschlossen.")
-        if client and client.is_connected():
-            client.publish(MQTT_TOPIC_GARAGE_STATUS, "opened_successfully")
-        
-        garage_occupied = is_garage_occupied()
-        update_leds(garage_occupied)
-        if client and client.is_connected():
-            client.publish(MQTT_TOPIC_GARAGE_STATUS, "occupied" if garage_occupied else "free")
-
-    elif current_garage_occupied:
-        print("Garage ist belegt. Öffnen nicht möglich.")
-        if client and client.is_connected():
-            client.publish(MQTT_TOPIC_GARAGE_STATUS, "error_occupied")
-    elif motion_sensor.is_active:
-        print("Bewegung erkannt (vor Öffnungsversuch). Öffnen aus Sicherheitsgründen nicht möglich.")
-        # Optionally publish a status for this case, e.g., "error_motion_before_open"
-
 def on_message(mqtt_client, userdata, msg):
+    """Only queues commands for the controller, so every message is handled immediately."""
     payload_str = msg.payload.decode()
     print(f"Nachricht empfangen auf Topic '{msg.topic}': {payload_str}")
     
     if msg.topic == MQTT_TOPIC_GARAGE_CONTROL:
         if payload_str == "STATUS_REQUEST": # Handle simple text command
-            print("Statusanfrage (Text) empfangen.")
-            current_status_str = "opening" if is_opening_garage else ("occupied" if garage_occupied else "free")
-            if client and client.is_connected():
-                client.publish(MQTT_TOPIC_GARAGE_STATUS, current_status_str)
+            controller.post("status")
         else: # Assume JSON for other commands
             try:
                 data = json.loads(payload_str) 
                 if isinstance(data, dict) and data.get("action") == "open":
                     print("Öffnungsanfrage (JSON) empfangen.")
-                    open_garage_procedure()
+                    controller.post("open")
                 else:
                     print(f"Unbekannte JSON-Aktion oder Format in '{payload_str}': {data}")
             except json.JSONDecodeError:
                 print(f"Konnte Nachricht nicht als JSON parsen und keine bekannte Text-Aktion: {payload_str}")
 
 def main():
-    global client, garage_occupied, is_opening_garage
+    global client
 
     # For paho-mqtt >= 2.0:
     client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
@@ -198,22 +126,17 @@ def main():
     print(f"Bewegungssensor HC SR501 auf Pin {MOTION_SENSOR_PIN}")
     print(f"Grüne LED auf Pin {GREEN_LED_PIN}, Rote LED auf Pin {RED_LED_PIN}")
     
-    garage_occupied = is_garage_occupied()
-    update_leds(garage_occupied)
-    if client.is_connected():
-         client.publish(MQTT_TOPIC_GARAGE_STATUS, "occupied" if garage_occupied else "free", retain=True)
+    prime_occupancy()
+    controller.start()
     
     try:
+        next_sample = time.monotonic()
         while True:
-            if not is_opening_garage: # Only check sensors if no opening sequence is active
-                current_status_occupied = is_garage_occupied()
-                if current_status_occupied != garage_occupied:
-                    print(f"Garagenstatus geändert: {'Belegt' if current_status_occupied else 'Frei'}")
-                    garage_occupied = current_status_occupied
-                    update_leds(garage_occupied)
-                    if client.is_connected():
-                        client.publish(MQTT_TOPIC_GARAGE_STATUS, "occupied" if garage_occupied else "free", retain=True)
-            time.sleep(0.5) # Main loop interval
+            # Confirmed changes are passed to the controller, which publishes them
+            # (deferred until the end of a running door cycle)
+            controller.sample(get_distance())
+            next_sample += 1.0 / SAMPLE_RATE
+            time.sleep(max(0, next_sample - time.monotonic()))
     except KeyboardInterrupt:
         print("Programm wird beendet (Strg+C)...")
     finally:
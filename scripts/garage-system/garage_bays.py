@@ -0,0 +1,219 @@
+import argparse
+import csv
+import json
+import os
+import resource
+import threading
+import time
+import paho.mqtt.client as mqtt
+from gpiozero import LED, MotionSensor, DistanceSensor
+from distance_filter import OccupancyFilter
+from garage_controller import GarageController, Scheduler
+
+# MQTT Configuration
+MQTT_BROKER = "10.0.0.1"
+MQTT_PORT = 1883
+MQTT_TOPIC_PREFIX = "garage"              # Bay status on garage/<bay>, occupancy on garage/<bay>/occupancy
+MQTT_TOPIC_BAY_CONTROL = "garage/+/control"  # Commands for one bay: "STATUS_REQUEST" or {"action": "open"}
+MQTT_TOPIC_GARAGE_CONTROL = "barrier"     # Also accepts {"action": "open", "bay": "<bay>"}
+MQTT_TOPIC_STATS = "garage/stats"         # Periodic memory and CPU report
+
+# Defaults for bays without their own thresholds (same meaning as in garage.py)
+ENTER_THRESHOLD = 0.10
+EXIT_THRESHOLD = 0.15
+MIN_DWELL = 1.0
+SAMPLE_RATE = 10          # Distance samples per second, for all bays together
+FILTER_MODE = "median"
+FILTER_WINDOW = 7
+EMA_ALPHA = 0.3
+STATS_INTERVAL = 60       # Seconds between memory/CPU reports
+
+client = None
+
+
+def read_bays(path):
+    """Reads the bay table (CSV, '#' lines are comments)."""
+    with open(path, newline="") as f:
+        rows = csv.DictReader(line for line in f if line.strip() and not line.startswith("#"))
+        bays = []
+        for row in rows:
+            bays.append({
+                "bay": row["bay"].strip(),
+                "pins": {key: int(row[key]) for key in
+                         ("trigger_pin", "echo_pin", "motion_pin", "green_pin", "red_pin")},
+                "enter_threshold": float(row.get("enter_threshold") or ENTER_THRESHOLD),
+                "exit_threshold": float(row.get("exit_threshold") or EXIT_THRESHOLD),
+            })
+    ids = [bay["bay"] for bay in bays]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Bay-IDs in %s sind nicht eindeutig" % path)
+    return bays
+
+
+def rss_mb():
+    """Current resident memory of the process (peak if /proc is not available)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def publish(topic, payload, retain=False):
+    if client and client.is_connected():
+        client.publish(topic, payload, retain=retain)
+
+
+class Bay:
+    """GPIO devices, filter and controller of one bay."""
+
+    def __init__(self, config, scheduler):
+        pins = config["pins"]
+        self.id = config["bay"]
+        self.distance_sensor = DistanceSensor(echo=pins["echo_pin"], trigger=pins["trigger_pin"],
+                                              max_distance=4.0)
+        motion_sensor = MotionSensor(pins["motion_pin"], queue_len=10, sample_rate=10, threshold=0.8)
+        occupancy = OccupancyFilter(config["enter_threshold"], config["exit_threshold"], MIN_DWELL,
+                                    mode=FILTER_MODE, window=FILTER_WINDOW, alpha=EMA_ALPHA)
+        topic = "%s/%s" % (MQTT_TOPIC_PREFIX, self.id)
+        self.controller = GarageController(LED(pins["green_pin"]), LED(pins["red_pin"]), motion_sensor,
+                                           occupancy, publish, topic, topic + "/occupancy",
+                                           name=self.id, scheduler=scheduler)
+
+    def get_distance(self):
+        try:
+            return self.distance_sensor.distance
+        except Exception as e:
+            print(f"[{self.id}] Fehler beim Lesen des Abstands: {e}")
+            return -1
+
+
+bays = {}
+
+
+def on_connect(mqtt_client, userdata, flags, rc, properties=None):
+    if rc == 0:
+        print("Erfolgreich mit MQTT Broker verbunden!")
+        mqtt_client.subscribe([(MQTT_TOPIC_BAY_CONTROL, 0), (MQTT_TOPIC_GARAGE_CONTROL, 0)])
+    else:
+        print(f"Verbindung zum MQTT Broker fehlgeschlagen, Rückgabecode: {rc}")
+
+
+def on_message(mqtt_client, userdata, msg):
+    """Routes a command to its bay's controller; never blocks."""
+    payload_str = msg.payload.decode()
+    if msg.topic == MQTT_TOPIC_GARAGE_CONTROL:
+        bay_id = None  # Commands without a bay are meant for the single-bay garage.py
+    else:
+        bay_id = msg.topic[len(MQTT_TOPIC_PREFIX) + 1:-len("/control")]
+    if payload_str == "STATUS_REQUEST":
+        event = "status"
+    else:
+        try:
+            data = json.loads(payload_str)
+        except json.JSONDecodeError:
+            print(f"Konnte Nachricht auf '{msg.topic}' nicht als JSON parsen: {payload_str}")
+            return
+        if not (isinstance(data, dict) and data.get("action") == "open"):
+            return
+        event = "open"
+        bay_id = data.get("bay", bay_id)
+    if bay_id is None:
+        return
+    bay = bays.get(str(bay_id))
+    if bay is None:
+        print(f"Unbekannte Bay '{bay_id}' in Nachricht auf '{msg.topic}'")
+        return
+    bay.controller.post(event)
+
+
+def report(start_wall, start_cpu, base_rss):
+    """Prints and publishes memory use and CPU time per bay since start."""
+    wall = time.monotonic() - start_wall
+    cpu = time.process_time() - start_cpu
+    rss = rss_mb()
+    per_bay = {}
+    for bay in bays.values():
+        c = bay.controller
+        per_bay[bay.id] = round((c.handler_cpu + c.sample_cpu) / wall * 100, 3)
+    stats = {
+        "bays": len(bays),
+        "threads": threading.active_count(),
+        "rss_mb": round(rss, 1),
+        "rss_per_bay_mb": round((rss - base_rss) / len(bays), 2),
+        "cpu_percent": round(cpu / wall * 100, 2),
+        "cpu_percent_per_bay": round(cpu / wall * 100 / len(bays), 3),
+        "filter_and_handler_cpu_percent": per_bay,
+    }
+    print("%d Bays, %d Threads, RSS %.1f MB (%.2f MB/Bay), CPU %.2f%% (%.3f%%/Bay)" % (
+        stats["bays"], stats["threads"], stats["rss_mb"], stats["rss_per_bay_mb"],
+        stats["cpu_percent"], stats["cpu_percent_per_bay"]))
+    publish(MQTT_TOPIC_STATS, json.dumps(stats, separators=(",", ":")))
+
+
+def main():
+    global client
+
+    parser = argparse.ArgumentParser(description="Garage control for many bays in one process")
+    parser.add_argument("--bays", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "bays.csv"),
+                        help="bay table (CSV)")
+    args = parser.parse_args()
+
+    base_rss = rss_mb()
+    scheduler = Scheduler()
+    for config in read_bays(args.bays):
+        bays[config["bay"]] = Bay(config, scheduler)
+    print(f"{len(bays)} Bays geladen: {', '.join(bays)}")
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    try:
+        print(f"Versuche, mit MQTT Broker auf {MQTT_BROKER}:{MQTT_PORT} zu verbinden...")
+        client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    except Exception as e:
+        print(f"Konnte nicht mit MQTT Broker verbinden: {e}")
+        print("Das Programm läuft ohne MQTT-Funktionalität weiter.")
+    client.loop_start()
+
+    # Prime all filters together, then start every bay on the shared scheduler
+    for _ in range(FILTER_WINDOW):
+        for bay in bays.values():
+            bay.controller.occupancy.update(bay.get_distance())
+        time.sleep(1.0 / SAMPLE_RATE)
+    for bay in bays.values():
+        occupancy = bay.controller.occupancy
+        if occupancy.distance is not None:
+            occupancy.occupied = occupancy.distance < occupancy.enter_threshold
+        bay.controller.start()
+
+    start_wall = time.monotonic()
+    start_cpu = time.process_time()
+    next_report = start_wall + STATS_INTERVAL
+    try:
+        next_sample = time.monotonic()
+        while True:
+            for bay in bays.values():
+                bay.controller.sample(bay.get_distance())
+            if time.monotonic() >= next_report:
+                report(start_wall, start_cpu, base_rss)
+                next_report += STATS_INTERVAL
+            next_sample += 1.0 / SAMPLE_RATE
+            time.sleep(max(0, next_sample - time.monotonic()))
+    except KeyboardInterrupt:
+        print("Programm wird beendet (Strg+C)...")
+    finally:
+        if client.is_connected():
+            client.loop_stop()
+            client.disconnect()
+        for bay in bays.values():
+            bay.controller.green_led.off()
+            bay.controller.red_led.off()
+        print("LEDs ausgeschaltet. Programm beendet.")
+
+
+if __name__ == '__main__':
+    main()
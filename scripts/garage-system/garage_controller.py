@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import json
+import queue
+import threading
+import time
+
+# States
+FREE = "free"
+OCCUPIED = "occupied"
+OPENING = "opening"
+INTERRUPTED = "interrupted"   # Motion during opening, red LED blinks
+
+OPENING_DURATION = 10   # Seconds the (simulated) door takes to open
+OPENING_BLINK = 0.25    # Green LED on/off time while opening
+ERROR_DURATION = 5      # Seconds the red LED blinks after an interruption
+ERROR_BLINK = 0.2       # Red LED on/off time after an interruption
+
+
+class Scheduler:
+    """Runs the event handlers of any number of controllers on one thread.
+
+    Deadlines are only set by handlers, i.e. on the scheduler thread, so the timer
+    heap needs no lock. A timer whose controller has moved on to another deadline
+    (or none) is skipped when it fires.
+    """
+
+    def __init__(self, name="garage"):
+        self.name = name
+        self.events = queue.Queue()
+        self.timers = []                 # heap of (when, seq, controller)
+        self.seq = itertools.count()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.thread.start()
+        return self
+
+    def post(self, controller, event, args=()):
+        self.events.put((controller, event, args))
+
+    def at(self, when, controller):
+        heapq.heappush(self.timers, (when, next(self.seq), controller))
+
+    def _run(self):
+        while True:
+            if self.timers and self.timers[0][0] <= time.monotonic():
+                when, _, controller = heapq.heappop(self.timers)
+                if controller.deadline != when:
+                    continue
+                controller.deadline = None
+                event, args = "deadline", ()
+            else:
+                timeout = None
+                if self.timers:
+                    timeout = max(0, self.timers[0][0] - time.monotonic())
+                try:
+                    controller, event, args = self.events.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+            start = time.thread_time()
+            controller.handle(event, args)
+            controller.handler_cpu += time.thread_time() - start
+
+
+class GarageController:
+    """Event-driven state machine of one garage bay.
+
+    Inputs are queued events: MQTT commands, motion sensor edges and confirmed occupancy
+    changes from the distance filter. Handling an event never sleeps; LED blinking runs
+    in gpiozero's background threads and the end of the opening and error phases is a
+    deadline of the event loop. Status requests are answered even during a door cycle.
+    Events run on `scheduler`, which may be shared by many bays (own one if None).
+    """
+
+    def __init__(self, green_led, red_led, motion_sensor, occupancy, publish,
+                 status_topic, occupancy_topic, name="garage", scheduler=None):
+        self.green_led = green_led
+        self.red_led = red_led
+        self.motion_sensor = motion_sensor
+        self.occupancy = occupancy        # OccupancyFilter, only updated from sample()
+        self.publish = publish            # publish(topic, payload, retain)
+        self.status_topic = status_topic
+        self.occupancy_topic = occupancy_topic
+        self.name = name
+        self.scheduler = scheduler or Scheduler(name)
+        self.state = FREE
+        self.occupied = False
+        self.distance = None
+        self.deadline = None
+        self.handler_cpu = 0.0   # CPU seconds spent in this bay's event handlers
+        self.sample_cpu = 0.0    # CPU seconds spent filtering this bay's samples
+        self.motion_sensor.when_motion = lambda: self.post("motion")
+
+    def start(self):
+        """Takes the (primed) filter state as the start state and starts the event loop."""
+        self.occupied = self.occupancy.occupied
+        self.distance = self.occupancy.distance
+        self.scheduler.start()
+        self.post("refresh")
+        return self
+
+    def post(self, event, *args):
+        """Thread-safe input; returns immediately."""
+        self.scheduler.post(self, event, args)
+
+    def sample(self, distance):
+        """Feeds one distance sample to the filter (called from the sampling loop)."""
+        start = time.thread_time()
+        if self.occupancy.update(distance):
+            self.post("occupancy", self.occupancy.occupied, self.occupancy.distance)
+        self.sample_cpu += time.thread_time() - start
+
+    @property
+    def status(self):
+        if self.state == OPENING:
+            return "opening"
+        return "occupied" if self.occupied else "free"
+
+    def handle(self, event, args):
+        """Runs one event (on the scheduler thread)."""
+        try:
+            getattr(self, "_on_" + event)(*args)
+        except Exception as e:
+            print(f"[{self.name}] Fehler bei Ereignis {event}: {e}")
+
+    def _set_deadline(self, delay):
+        self.deadline = time.monotonic() + delay
+        self.scheduler.at(self.deadline, self)
+
+    def _publish_status(self, status, retain=False):
+        self.publish(self.status_topic, status, retain)
+
+    def _publish_occupancy(self):
+        self._publish_status(self.status, retain=True)
+        distance = round(self.distance, 3) if self.distance is not None else None
+        self.publish(self.occupancy_topic,
+                     json.dumps({"state": self.status, "distance": distance}), True)
+
+    def _show_occupancy(self):
+        self.state = OCCUPIED if self.occupied else FREE
+        if self.occupied:
+            self.green_led.off()
+            self.red_led.on()
+        else:
+            self.green_led.on()
+            self.red_led.off()
+
+    def _on_refresh(self):
+        self._show_occupancy()
+        self._publish_occupancy()
+
+    def _on_status(self):
+        print(f"[{self.name}] Statusanfrage empfangen.")
+        self._publish_status(self.status)
+
+    def _on_occupancy(self, occupied, distance):
+        self.occupied = occupied
+        self.distance = distance
+        if self.state in (FREE, OCCUPIED):
+            print(f"[{self.name}] Garagenstatus geändert: {'Belegt' if occupied else 'Frei'} ({distance:.2f} m)")
+            self._show_occupancy()
+            self._publish_occupancy()
+        # During a door cycle the final state is published when the cycle ends
+
+    def _on_open(self):
+        print(f"[{self.name}] Öffnungsanfrage erhalten. Prüfe Bedingungen...")
+        if self.state in (OPENING, INTERRUPTED):
+            print(f"[{self.name}] Öffnungsvorgang läuft bereits.")
+        elif self.occupied:
+            print(f"[{self.name}] Garage ist belegt. Öffnen nicht möglich.")
+            self._publish_status("error_occupied")
+        elif self.motion_sensor.is_active:
+            print(f"[{self.name}] Bewegung erkannt (vor Öffnungsversuch). Öffnen aus Sicherheitsgründen nicht möglich.")
+        else:
+            print(f"[{self.name}] Bedingungen erfüllt. Garage wird geöffnet.")
+            self.state = OPENING
+            self._publish_status("opening")
+            self.red_led.off()
+            self.green_led.blink(on_time=OPENING_BLINK, off_time=OPENING_BLINK)
+            self._set_deadline(OPENING_DURATION)
+
+    def _on_motion(self):
+        if self.state != OPENING:
+            return
+        print(f"[{self.name}] BEWEGUNG WÄHREND DES ÖFFNENS ERKANNT (LICHTSCHRANKE)!")
+        self.state = INTERRUPTED
+        self.green_led.off()
+        self._publish_status("interrupted_by_motion")
+        self.red_led.blink(on_time=ERROR_BLINK, off_time=ERROR_BLINK)
+        self._set_deadline(ERROR_DURATION)
+
+    def _on_deadline(self):
+        if self.state == OPENING:
+            self.green_led.off()
+            print(f"[{self.name}] Garagenöffnung (simuliert) abgeschlossen.")
+            self._publish_status("opened_successfully")
+        elif self.state == INTERRUPTED:
+            self.red_led.off()
+        self._show_occupancy()
+        self._publish_occupancy()
@@ -0,0 +1,64 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Response, abort, request
+
+ASSET_MAX_AGE = 365 * 24 * 3600   # Asset URLs carry a content hash, so they may be cached for good
+MIN_COMPRESS = 512                # Smaller bodies are sent uncompressed
+
+
+class Body:
+    """A response body that is gzip-compressed at most once, on the first request that accepts it."""
+
+    def __init__(self, data, mimetype):
+        self.data = data
+        self.mimetype = mimetype
+        self.gzipped = None
+
+    def response(self, etag=None, max_age=None):
+        data, encoding = self.data, None
+        if len(self.data) >= MIN_COMPRESS and request.accept_encodings["gzip"]:
+            if self.gzipped is None:
+                self.gzipped = gzip.compress(self.data, 6)
+            data, encoding = self.gzipped, "gzip"
+        if etag is not None and request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(data, mimetype=self.mimetype)
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        if etag is not None:
+            response.set_etag(etag)
+        response.headers["Vary"] = "Accept-Encoding"
+        if max_age is None:
+            response.headers["Cache-Control"] = "no-cache"
+        else:
+            response.headers["Cache-Control"] = "public, max-age=%d, immutable" % max_age
+        return response
+
+
+class Assets:
+    """Static files, read and hashed once at startup and served from memory."""
+
+    def __init__(self, folder):
+        self.files = {}
+        self.versions = {}
+        for name in sorted(os.listdir(folder)):
+            with open(os.path.join(folder, name), "rb") as f:
+                data = f.read()
+            # Flask adds "; charset=utf-8" to text mimetypes itself
+            mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            self.files[name] = Body(data, mimetype)
+            self.versions[name] = hashlib.sha1(data).hexdigest()[:12]
+
+    def url(self, name):
+        """URL with the content hash, so a changed file gets a new URL."""
+        return "/static/%s?v=%s" % (name, self.versions[name])
+
+    def response(self, name):
+        body = self.files.get(name)
+        if body is None:
+            abort(404)
+        return body.response(etag=self.versions[name], max_age=ASSET_MAX_AGE)
@@ -0,0 +1,65 @@
+import json
+import queue
+import threading
+
+CLIENT_QUEUE = 256     # Events buffered per client before it counts as too slow
+KEEPALIVE = 15         # Seconds between keep-alive comments on an idle stream
+RETRY_MS = 1000        # Reconnect delay the browser uses after a dropped stream
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue = queue.Queue(CLIENT_QUEUE)
+        self.dropped = False
+
+
+class Broadcaster:
+    """Fans out Server-Sent Events from the MQTT thread to all connected browsers.
+
+    Each event is serialised once and only queued per client, so the MQTT thread never
+    waits for a browser. A client whose queue is full is dropped; its browser reconnects
+    and starts again from a fresh snapshot.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    @staticmethod
+    def format(event, data):
+        return "event: %s\ndata: %s\n\n" % (event, json.dumps(data, separators=(",", ":")))
+
+    def publish(self, event, data):
+        message = self.format(event, data)
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except queue.Full:
+                subscriber.dropped = True
+                self.unsubscribe(subscriber)
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def stream(self, snapshot):
+        """Generator for one client: `snapshot()` returns the first (event, data), then deltas follow."""
+        subscriber = Subscriber()
+        # Subscribe before taking the snapshot so no delta in between is lost
+        with self.lock:
+            self.subscribers.add(subscriber)
+        try:
+            yield "retry: %d\n\n" % RETRY_MS
+            yield self.format(*snapshot())
+            while not subscriber.dropped:
+                try:
+                    yield subscriber.queue.get(timeout=KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,234 @@
+import heapq
+import sqlite3
+import threading
+import time
+
+BATCH_SIZE = 200        # Events per transaction at most
+FLUSH_INTERVAL = 0.25   # Seconds an event may wait before it is written
+OUTBOX_MAX_AGE = 5.0    # Seconds after which a queued command is dropped unsent
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id      INTEGER PRIMARY KEY,
+    ts      REAL NOT NULL,
+    topic   TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+-- Pages are walked in id order: by primary key, or per topic by (topic, id). Time
+-- ranges are turned into id ranges through events_ts (ids grow with ts).
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+DROP INDEX IF EXISTS events_topic_ts;
+CREATE INDEX IF NOT EXISTS events_topic_id ON events (topic, id);
+-- Current dashboard state; version is the id of the event that set the value
+CREATE TABLE IF NOT EXISTS state (
+    key     TEXT PRIMARY KEY,
+    value   TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+-- Messages web workers want published; sent and deleted by the MQTT ingest process
+CREATE TABLE IF NOT EXISTS outbox (
+    id      INTEGER PRIMARY KEY,
+    topic   TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+def matching_topics(db, topic):
+    """Stored topics matching an exact topic or an MQTT-style prefix ("garage/#").
+
+    A prefix is expanded by stepping through the distinct topics of events_topic_id,
+    one index lookup per topic, instead of scanning the events.
+    """
+    if not topic.endswith("/#"):
+        return [topic]
+    prefix = topic[:-2]
+    low, high = prefix + "/", prefix + "0"   # "0" sorts right after "/"
+    topics = [prefix]
+    current = low
+    while True:
+        row = db.execute("SELECT min(topic) FROM events WHERE topic > ? AND topic < ?",
+                         (current, high)).fetchone()
+        if row[0] is None:
+            return topics
+        topics.append(row[0])
+        current = row[0]
+
+
+class HistoryStore:
+    """Append-only MQTT event history in SQLite (WAL mode).
+
+    `add` only appends to a pending list, so the MQTT thread never waits for the disk;
+    a writer thread stores the pending events in one transaction per batch. Queries
+    page newest-first by event id and can be limited to a time range and a topic; every
+    page is an index walk, so its cost does not grow with the size of the history.
+    `last_id` is the newest stored id; query results below it never change.
+    With `readonly`, no writer is started (web workers reading another process's store).
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        self.pending = []
+        self.wake = threading.Event()
+        self.running = True
+        self.local = threading.local()
+        db = self._connect()
+        db.executescript(SCHEMA)
+        self._migrate(db)
+        self._last_id = self._max_id(db)
+        db.close()
+        self.thread = None
+        if not readonly:
+            self.thread = threading.Thread(target=self._run, name="history", daemon=True)
+            self.thread.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @staticmethod
+    def _migrate(db):
+        """Adds the outbox timestamp to databases created before it existed."""
+        columns = [row[1] for row in db.execute("PRAGMA table_info(outbox)")]
+        if "created" not in columns:
+            try:
+                db.execute("ALTER TABLE outbox ADD COLUMN created REAL NOT NULL DEFAULT 0")
+            except sqlite3.OperationalError:
+                pass  # Added by another process in the meantime
+
+    @staticmethod
+    def _max_id(db):
+        return db.execute("SELECT max(id) FROM events").fetchone()[0] or 0
+
+    @property
+    def last_id(self):
+        if self.readonly:
+            return self._max_id(self.connection())
+        return self._last_id
+
+    def add(self, ts, topic, payload, changes=None):
+        """Queues one event and the state changes it caused (written in the same transaction)."""
+        with self.lock:
+            self.pending.append((ts, topic, payload, changes))
+            if len(self.pending) >= BATCH_SIZE:
+                self.wake.set()
+
+    def _run(self):
+        db = self._connect()
+        while self.running:
+            self.wake.wait(FLUSH_INTERVAL)
+            self.wake.clear()
+            self._flush(db)
+        self._flush(db)
+        db.close()
+
+    def _flush(self, db):
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            with db:
+                for ts, topic, payload, changes in batch:
+                    event_id = db.execute("INSERT INTO events (ts, topic, payload) VALUES (?, ?, ?)",
+                                          (ts, topic, payload)).lastrowid
+                    if changes:
+                        db.executemany("INSERT OR REPLACE INTO state (key, value, version) VALUES (?, ?, ?)",
+                                       [(key, value, event_id) for key, value in changes.items()])
+            self._last_id = self._max_id(db)
+        except sqlite3.Error as e:
+            print(f"Fehler beim Schreiben der Historie ({len(batch)} Einträge verworfen): {e}")
+
+    def query(self, topic=None, start=None, end=None, before=None, limit=100):
+        """Newest events first as dicts (id, ts, topic, payload). `before` is the id to continue below."""
+        db = self.connection()
+        # Time range -> id range (ids are assigned in arrival order, so they grow with ts)
+        low = 0
+        if start is not None:
+            low = self._first_id(db, start)
+            if low is None:
+                return []
+        high = before
+        if end is not None:
+            end_id = self._first_id(db, end)
+            if end_id is not None:
+                high = end_id if high is None else min(high, end_id)
+        conditions, params = ["id >= ?"], [low]
+        if high is not None:
+            conditions.append("id < ?")
+            params.append(high)
+        where = " AND ".join(conditions)
+        if not topic:
+            rows = db.execute("SELECT id, ts, topic, payload FROM events WHERE %s "
+                              "ORDER BY id DESC LIMIT ?" % where, params + [limit]).fetchall()
+        else:
+            # One index walk per topic, merged by id
+            pages = [db.execute("SELECT id, ts, topic, payload FROM events WHERE topic = ? AND %s "
+                                "ORDER BY id DESC LIMIT ?" % where, [name] + params + [limit]).fetchall()
+                     for name in matching_topics(db, topic)]
+            rows = list(heapq.merge(*pages, key=lambda r: -r[0]))[:limit]
+        return [{"id": r[0], "ts": r[1], "topic": r[2], "payload": r[3]} for r in rows]
+
+    @staticmethod
+    def _first_id(db, ts):
+        """Id of the first event at or after `ts`, or None."""
+        row = db.execute("SELECT id FROM events WHERE ts >= ? ORDER BY ts, id LIMIT 1", (ts,)).fetchone()
+        return row[0] if row else None
+
+    def connection(self):
+        """One connection per calling thread; WAL readers never block the writer."""
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = self.local.db = self._connect()
+        return db
+
+    def send(self, topic, payload):
+        """Queues an MQTT message for the ingest process (see drain_outbox)."""
+        db = self.connection()
+        with db:
+            db.execute("INSERT INTO outbox (topic, payload, created) VALUES (?, ?, ?)",
+                       (topic, payload, time.time()))
+
+    def expire_outbox(self, max_age=OUTBOX_MAX_AGE):
+        """Drops queued messages older than `max_age` seconds; returns how many.
+
+        A gate command that could not be sent in time must not fire later, when
+        nobody expects the barrier to move.
+        """
+        db = self.connection()
+        with db:
+            dropped = db.execute("DELETE FROM outbox WHERE created < ?",
+                                 (time.time() - max_age,)).rowcount
+        if dropped:
+            print("%d veraltete Befehle verworfen (älter als %g s)" % (dropped, max_age))
+        return dropped
+
+    def drain_outbox(self, publish):
+        """Publishes the queued messages oldest first; returns how many were sent.
+
+        `publish(topic, payload)` returns whether the message was handed to the broker
+        connection. A message is only deleted after that; on the first failure the
+        rest stay queued for the next call.
+        """
+        db = self.connection()
+        sent = 0
+        for row_id, topic, payload in db.execute(
+                "SELECT id, topic, payload FROM outbox ORDER BY id").fetchall():
+            if not publish(topic, payload):
+                break
+            with db:
+                db.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+            sent += 1
+        return sent
+
+    def close(self):
+        """Writes the remaining events and stops the writer thread."""
+        self.running = False
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
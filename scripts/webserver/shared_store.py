@@ -0,0 +1,81 @@
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+
+from state_store import Snapshot
+
+POLL_INTERVAL = 0.25   # Seconds between checks for new events (live updates)
+
+
+def log_entry(ts, topic, payload):
+    return {"time": datetime.fromtimestamp(ts).strftime("%H:%M:%S"), "topic": topic, "payload": payload}
+
+
+class SharedStore:
+    """Read side of the history database for WSGI worker processes.
+
+    The MQTT ingest process writes events and state in one transaction per batch, so
+    every worker derives the same Snapshot from the database. The snapshot version is
+    the newest event id; a snapshot is only rebuilt when that id has changed.
+    """
+
+    def __init__(self, history, state, log_size=100):
+        self.history = history
+        self.defaults = dict(state)
+        self.log_size = log_size
+        self.cached = None
+        self.watch_lock = threading.Lock()
+        self.watcher = None
+
+    @property
+    def current(self):
+        db = self.history.connection()
+        with db:
+            # One read transaction, so state and log belong to the same version
+            db.execute("BEGIN")
+            version = db.execute("SELECT max(id) FROM events").fetchone()[0] or 0
+            cached = self.cached
+            if cached is not None and cached.version == version:
+                return cached
+            state = dict(self.defaults)
+            state_version = 0
+            for key, value, changed in db.execute("SELECT key, value, version FROM state"):
+                state[key] = value
+                state_version = max(state_version, changed)
+            rows = db.execute("SELECT ts, topic, payload FROM events WHERE id <= ? ORDER BY id DESC LIMIT ?",
+                              (version, self.log_size)).fetchall()
+        snapshot = Snapshot(version, MappingProxyType(state), tuple(log_entry(*row) for row in rows),
+                            state_version)
+        self.cached = snapshot
+        return snapshot
+
+    def watch(self, on_log, on_state):
+        """Starts (once per process) a thread that reports new events and state changes.
+
+        on_log(version, entry) and on_state(snapshot) are called from that thread.
+        """
+        with self.watch_lock:
+            if self.watcher is None:
+                self.watcher = threading.Thread(target=self._watch, args=(on_log, on_state),
+                                                name="shared-store", daemon=True)
+                self.watcher.start()
+
+    def _watch(self, on_log, on_state):
+        last = self.current
+        while True:
+            time.sleep(POLL_INTERVAL)
+            try:
+                snapshot = self.current
+                if snapshot.version == last.version:
+                    continue
+                rows = self.history.connection().execute(
+                    "SELECT id, ts, topic, payload FROM events WHERE id > ? AND id <= ? ORDER BY id",
+                    (max(last.version, snapshot.version - self.log_size), snapshot.version)).fetchall()
+                for event_id, ts, topic, payload in rows:
+                    on_log(event_id, log_entry(ts, topic, payload))
+                if snapshot.state_version != last.state_version:
+                    on_state(snapshot)
+                last = snapshot
+            except Exception as e:
+                print(f"Fehler beim Lesen des gemeinsamen Zustands: {e}")
@@ -0,0 +1,37 @@
+import threading
+from collections import deque, namedtuple
+from types import MappingProxyType
+
+# One consistent view of the dashboard data. `state` is read-only and `log` a tuple
+# (newest first), so a snapshot never changes after it has been published.
+# `state_version` is the version at which `state` last changed.
+Snapshot = namedtuple("Snapshot", "version state log state_version")
+
+
+class StateStore:
+    """Versioned state and live log shared by the MQTT thread and request threads.
+
+    The writer builds a complete new Snapshot and replaces the reference to the
+    current one; readers just take `store.current` and never lock or see half an
+    update. The version grows with every update, so equal versions mean equal data.
+    """
+
+    def __init__(self, state, log_size=100):
+        self.lock = threading.Lock()   # Serialises writers only
+        self.ring = deque(maxlen=log_size)
+        self.current = Snapshot(0, MappingProxyType(dict(state)), (), 0)
+
+    def apply(self, entry=None, changes=None):
+        """Adds a log entry and/or state changes, returns the new snapshot."""
+        with self.lock:
+            old = self.current
+            version = old.version + 1
+            state, state_version = old.state, old.state_version
+            if changes and any(state.get(k) != v for k, v in changes.items()):
+                state, state_version = MappingProxyType(dict(state, **changes)), version
+            log = old.log
+            if entry is not None:
+                self.ring.appendleft(entry)
+                log = tuple(self.ring)
+            self.current = Snapshot(version, state, log, state_version)
+            return self.current
@@ -0,0 +1,51 @@
+// The page is loaded once; state changes and new log entries arrive as events
+const logBox = document.getElementById("log");
+const MAX_LOG = Number(logBox.dataset.logSize);
+// Deltas already contained in the last snapshot are skipped
+let logVersion = 0;
+let stateVersion = 0;
+
+function setState(data) {
+    for (const name of ["garage", "barrier"]) {
+        document.getElementById(name + "-status").textContent = data.state[name];
+        document.getElementById(name + "-light").className = "ampel " + data.colors[name];
+    }
+}
+
+function logEntry(entry) {
+    const div = document.createElement("div");
+    div.className = "entry " + entry.topic;
+    const time = document.createElement("span");
+    time.className = "time";
+    time.textContent = "[" + entry.time + "]";
+    const topic = document.createElement("strong");
+    topic.textContent = entry.topic;
+    div.append(time, " ", topic, ": " + entry.payload);
+    return div;
+}
+
+const events = new EventSource("/events");
+events.addEventListener("snapshot", (e) => {
+    const data = JSON.parse(e.data);
+    logVersion = stateVersion = data.version;
+    setState(data);
+    logBox.replaceChildren(...data.log.map(logEntry));
+});
+events.addEventListener("state", (e) => {
+    const data = JSON.parse(e.data);
+    if (data.version > stateVersion) {
+        stateVersion = data.version;
+        setState(data);
+    }
+});
+events.addEventListener("log", (e) => {
+    const data = JSON.parse(e.data);
+    if (data.version <= logVersion) {
+        return;
+    }
+    logVersion = data.version;
+    logBox.prepend(logEntry(data.entry));
+    while (logBox.children.length > MAX_LOG) {
+        logBox.lastChild.remove();
+    }
+});
@@ -1,13 +1,36 @@
-from flask import Flask, render_template_string, request, redirect
+from flask import Flask, Response, render_template, request, redirect
 import paho.mqtt.client as mqtt
-from threading import Thread
+from threading import Lock, Thread
+from collections import OrderedDict
 from datetime import datetime
+import argparse
+import atexit
+import hashlib
 import json
+import os
+import time
+from assets import Assets, Body
+from broadcast import Broadcaster
+from history import HistoryStore
+from shared_store import SharedStore
+from state_store import StateStore
 
-app = Flask(__name__)
+# Static files are served from memory by the "static" route below
+app = Flask(__name__, static_folder=None)
 
-log = []
-state = {
+LOG_SIZE = 100    # Entries in the live log (newest first)
+API_PAGE_SIZE = 50         # Default page size of /api/log and /api/plates
+API_MAX_PAGE_SIZE = 1000
+API_CACHE_SIZE = 256       # Serialised API responses kept by ETag
+HISTORY_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mqtt_history.db")
+OUTBOX_INTERVAL = 0.1   # Seconds between outbox checks of the ingest process
+
+# Production mode: this process is one of several WSGI workers. They have no MQTT
+# connection; they read the database written by `webserver.py --ingest` and queue
+# barrier commands in its outbox.
+SHARED = os.environ.get("SMARTGATE_SHARED") == "1"
+
+INITIAL_STATE = {
     "garage": "unknown",
     "barrier": "unknown"
 }
@@ -17,32 +40,81 @@ MQTT_BROKER = "10.0.0.1"
 #MQTT_TOPICS = ["garage", "barrier", "plate"] # for specific topics
 MQTT_TOPICS = ["#"] # subscribe to all topics (for testing purposes)
 
-mqtt_client = mqtt.Client()
+# Live updates for open dashboards (Server-Sent Events on /events)
+broadcaster = Broadcaster()
+
+if SHARED:
+    history = HistoryStore(HISTORY_DB, readonly=True)
+    store = SharedStore(history, INITIAL_STATE, LOG_SIZE)
+    mqtt_client = None
+else:
+    # Every MQTT message is also kept on disk, written in batches by a background thread
+    history = HistoryStore(HISTORY_DB)
+    atexit.register(history.close)
+    # Written only by the MQTT thread; requests read immutable snapshots of it
+    store = StateStore(INITIAL_STATE, LOG_SIZE)
+    mqtt_client = mqtt.Client()
+
+def colors(state):
+    """Traffic light colors for the current state."""
+    garage_color = "gray"
+    if state["garage"] == "occupied" or state["garage"] == "error_occupied":
+        garage_color = "red"
+    elif state["garage"] == "free":
+        garage_color = "green"
+
+    barrier_color = "gray"
+    if state["barrier"] == "open":
+        barrier_color = "green"
+    elif state["barrier"] == "closed":
+        barrier_color = "red"
+    return {"garage": garage_color, "barrier": barrier_color}
 
 def on_message(client, userdata, msg):
     payload = msg.payload.decode()
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    log.insert(0, {
-        "time": timestamp,
+    now = datetime.now()
+    entry = {
+        "time": now.strftime("%H:%M:%S"),
         "topic": msg.topic,
         "payload": payload
-    })
-    if len(log) > 100:
-        log.pop()
+    }
 
     # safe state for traffic light
+    changes = {}
     if msg.topic == "garage":
-        state["garage"] = payload
+        changes["garage"] = payload
     elif msg.topic == "barrier":
         try:
             data = json.loads(payload)
             action = data.get("action", "")
             if action == "open":
-                state["barrier"] = "open"
+                changes["barrier"] = "open"
             elif action == "closed":
-                state["barrier"] = "closed"
+                changes["barrier"] = "closed"
         except json.JSONDecodeError:
-            state["barrier"] = "unknown"
+            changes["barrier"] = "unknown"
+
+    old = store.current
+    snapshot = store.apply(entry, changes)
+    history.add(now.timestamp(), msg.topic, payload,
+                {key: value for key, value in changes.items() if old.state.get(key) != value})
+    broadcast_log(snapshot.version, entry)
+    if snapshot.state is not old.state:
+        broadcast_state(snapshot)
+
+def broadcast_log(version, entry):
+    broadcaster.publish("log", {"version": version, "entry": entry})
+
+def broadcast_state(snapshot):
+    broadcaster.publish("state", {"version": snapshot.version, "state": dict(snapshot.state),
+                                  "colors": colors(snapshot.state)})
+
+def send_command(topic, payload):
+    """Publishes directly, or through the ingest process's outbox in production mode."""
+    if SHARED:
+        history.send(topic, payload)
+    else:
+        mqtt_client.publish(topic, payload)
 
 def mqtt_thread():
     mqtt_client.on_message = on_message
@@ -52,94 +124,206 @@ def mqtt_thread():
         mqtt_client.subscribe("#") # subscribe to all topics (for testing purposes)
     mqtt_client.loop_forever()
 
+assets = Assets(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"))
+app.jinja_env.globals["asset_url"] = assets.url
+
+# Templates are compiled once at startup
+index_template = app.jinja_env.get_template("index.html")
+history_template = app.jinja_env.get_template("history.html")
+
+page_cache = None  # (state version, rendered dashboard)
+
+@app.route("/static/<name>")
+def static(name):
+    return assets.response(name)
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
         action = request.form.get("action")
         if action == "open_gate":
-            mqtt_client.publish("barrier", '{"action":"open"}')
+            send_command("barrier", '{"action":"open"}')
         elif action == "close_gate":
-            mqtt_client.publish("barrier", '{"action":"close"}')
+            send_command("barrier", '{"action":"close"}')
         return redirect("/")
 
-    # traffic light color logic
-    garage_color = "gray"
-    if state["garage"] == "occupied" or state["garage"] == "error_occupied":
-        garage_color = "red"
-    elif state["garage"] == "free":
-        garage_color = "green"
+    global page_cache
+    snapshot = store.current
+    cached = page_cache
+    if cached is None or cached[0] != snapshot.version:
+        # Rendered at most once per state version, however many dashboards are open
+        html = render_template(index_template, log=snapshot.log, state=snapshot.state,
+                               colors=colors(snapshot.state), log_size=LOG_SIZE)
+        cached = page_cache = (snapshot.version, Body(html.encode(), "text/html"))
+    return cached[1].response(etag="page-%s%d" % (BOOT_ID, snapshot.version))
 
-    barrier_color = "gray"
-    if state["barrier"] == "open":
-        barrier_color = "green"
-    elif state["barrier"] == "closed":
-        barrier_color = "red"
-        
-    return render_template_string("""
-        <html>
-        <head>
-            <style>
-                body { font-family: Arial, sans-serif; background: #f4f4f4; padding: 20px; }
-                h2, h3 { color: #333; }
-
-                .status-box { display: flex; gap: 20px; margin-bottom: 20px; }
-                .ampel {
-                    width: 100px; height: 100px; border-radius: 50%;
-                    display: flex; align-items: center; justify-content: center;
-                    font-weight: bold; color: white; font-size: 1em;
-                }
-
-                .gray { background: #aaa; }
-                .green { background: #4CAF50; }
-                .red { background: #f44336; }
-                .yellow { background: #ffcc00; color: black; }
-
-                button { margin: 5px; padding: 10px; border-radius: 5px; border: none; background: #008CBA; color: white; cursor: pointer; }
-                button:hover { background: #0079a1; }
-
-                .log { background: #fff; border: 1px solid #ccc; padding: 10px; height: 300px; overflow-y: scroll; }
-                .entry { padding: 5px; border-bottom: 1px solid #eee; }
-                .garage { color: darkblue; }
-                .barrier { color: darkgreen; }
-                .plate { color: darkred; }
-                .time { font-size: 0.85em; color: #666; margin-right: 10px; }
-            </style>
-        </head>
-        <body>
-            <h2>Smart-Gate Dashboard</h2>
-
-            <div class="status-box">
-                <div>
-                    <div class="ampel {{ garage_color }}">Garage</div>
-                    <p>Status: {{ state.garage }}</p>
-                </div>
-                <div>
-                    <div class="ampel {{ barrier_color }}">Schranke</div>
-                    <p>Status: {{ state.barrier }}</p>
-                </div>
-            </div>
-
-            <h3>Aktionen</h3>
-            <form method="post">
-                <button name="action" value="open_gate">Schranke öffnen</button>
-                <button name="action" value="close_gate">Schranke schließen</button>
-            </form>
-
-            <h3>MQTT Log</h3>
-            <div class="log">
-                {% for entry in log %}
-                    <div class="entry {{ entry.topic }}">
-                        <span class="time">[{{ entry.time }}]</span>
-                        <strong>{{ entry.topic }}</strong>: {{ entry.payload }}
-                    </div>
-                {% endfor %}
-            </div>
-            <meta http-equiv="refresh" content="2">
-        </body>
-        </html>
-    """, log=log, state=state, garage_color=garage_color, barrier_color=barrier_color)
+def parse_time(value):
+    """Epoch seconds from an ISO date/time ("2026-10-18T08:00") or None."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
 
-if __name__ == "__main__":
+@app.route("/history")
+def history_page():
+    """Pages through the stored events, newest first, filtered by topic and time range."""
+    topic = request.args.get("topic", "").strip()
+    start = request.args.get("start", "")
+    end = request.args.get("end", "")
+    before = request.args.get("before", type=int)
+    limit = max(1, min(request.args.get("limit", 100, type=int), 1000))
+    events = history.query(topic or None, parse_time(start), parse_time(end), before, limit)
+    for event in events:
+        event["time"] = datetime.fromtimestamp(event["ts"]).strftime("%Y-%m-%d %H:%M:%S")
+    older = None
+    if len(events) == limit:
+        older = dict(request.args, before=events[-1]["id"])
+    return render_template(history_template, events=events, topic=topic, start=start, end=end, older=older)
+
+def snapshot():
+    """Full state and log for a (re)connecting dashboard."""
+    snapshot = store.current
+    return "snapshot", {"version": snapshot.version, "state": dict(snapshot.state),
+                        "colors": colors(snapshot.state), "log": snapshot.log}
+
+# In-memory snapshot versions start again at 0 after a restart; the boot id keeps the
+# ETags of different runs apart. Shared workers take their versions from the database,
+# so their ETags must agree between workers and get no boot id.
+BOOT_ID = "" if SHARED else os.urandom(8).hex()
+
+api_cache = OrderedDict()  # ETag -> serialised body, least recently used first
+api_cache_lock = Lock()
+
+def dumps(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+def json_response(key, build):
+    """JSON response for the data version `key`, with ETag/If-None-Match support.
+
+    An unchanged poll gets 304 without building anything; a changed one is built once
+    and the body is reused for every further request of the same version. The cache
+    only saves the serialisation: a miss is one index walk in the history database.
+    """
+    etag = hashlib.sha1((BOOT_ID + key).encode()).hexdigest()[:20]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        with api_cache_lock:
+            body = api_cache.get(etag)
+            if body is not None:
+                api_cache.move_to_end(etag)
+        if body is None:
+            body = dumps(build())
+            with api_cache_lock:
+                api_cache[etag] = body
+                if len(api_cache) > API_CACHE_SIZE:
+                    api_cache.popitem(last=False)
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def page_args():
+    """Cursor (id to continue below) and page size of a paginated request."""
+    cursor = request.args.get("cursor", type=int)
+    limit = max(1, min(request.args.get("limit", API_PAGE_SIZE, type=int), API_MAX_PAGE_SIZE))
+    return cursor, limit
+
+def page_key(name, cursor, limit, *extra):
+    """Cache key and upper id bound of one page.
+
+    Pages below a cursor never change. The newest page is pinned to the last stored
+    event, so its key changes exactly when new events have been written.
+    """
+    if cursor is None:
+        newest = history.last_id
+        return "%s:newest:%d:%d:%r" % (name, newest, limit, extra), newest + 1
+    return "%s:%d:%d:%r" % (name, cursor, limit, extra), cursor
+
+@app.route("/api/state")
+def api_state():
+    """Current garage and barrier state."""
+    snapshot = store.current
+    return json_response("state:%d" % snapshot.state_version, lambda: {
+        "version": snapshot.state_version,
+        "state": dict(snapshot.state),
+        "colors": colors(snapshot.state),
+    })
+
+@app.route("/api/log")
+def api_log():
+    """Stored MQTT events, newest first. Query: topic (exact or "garage/#"), cursor, limit."""
+    cursor, limit = page_args()
+    topic = request.args.get("topic") or None
+    key, before = page_key("log", cursor, limit, topic)
+
+    def build():
+        events = history.query(topic, before=before, limit=limit)
+        return {
+            "events": events,
+            "next_cursor": events[-1]["id"] if len(events) == limit else None,
+        }
+    return json_response(key, build)
+
+@app.route("/api/plates")
+def api_plates():
+    """Recent plate reads from the LPR node, newest first. Query: cursor, limit."""
+    cursor, limit = page_args()
+    key, before = page_key("plates", cursor, limit)
+
+    def build():
+        events = history.query("plate", before=before, limit=limit)
+        plates = []
+        for event in events:
+            try:
+                data = json.loads(event["payload"])
+            except ValueError:
+                continue
+            if isinstance(data, dict) and data.get("plate-present"):
+                plates.append({"id": event["id"], "ts": event["ts"], "plate": data["plate-present"],
+                               "confidence": data.get("confidence")})
+        return {
+            "plates": plates,
+            "next_cursor": events[-1]["id"] if len(events) == limit else None,
+        }
+    return json_response(key, build)
+
+@app.route("/events")
+def events():
+    """Server-Sent Events stream: a snapshot, then "state" and "log" deltas."""
+    if SHARED:
+        store.watch(broadcast_log, broadcast_state)
+    return Response(broadcaster.stream(snapshot), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def run_ingest():
+    """MQTT ingest for production mode: the single broker connection behind all workers."""
     Thread(target=mqtt_thread, daemon=True).start()
-    app.run(host="0.0.0.0", port=5000)
+    print("MQTT-Ingest läuft, Datenbank:", HISTORY_DB)
+    def publish(topic, payload):
+        return mqtt_client.publish(topic, payload).rc == mqtt.MQTT_ERR_SUCCESS
+
+    try:
+        while True:
+            history.expire_outbox()
+            # Commands wait in the outbox while the broker is unreachable
+            if mqtt_client.is_connected():
+                history.drain_outbox(publish)
+            time.sleep(OUTBOX_INTERVAL)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart-Gate dashboard")
+    parser.add_argument("--ingest", action="store_true",
+                        help="only run the MQTT ingest for production workers (see README)")
+    args = parser.parse_args()
+    if args.ingest:
+        run_ingest()
+    else:
+        Thread(target=mqtt_thread, daemon=True).start()
+        # threaded: every open /events stream holds one request thread
+        app.run(host="0.0.0.0", port=5000, threaded=True)
 